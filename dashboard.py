@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import os
 
@@ -41,12 +42,30 @@ sorted_labels = sorted(file_options.keys(), key=sort_key)
 selected_label = st.sidebar.selectbox("Select Dataset", sorted_labels, index=0)
 DATA_FILE = file_options[selected_label]
 
+# Category columns hold a few dozen distinct labels; as categoricals they are
+# stored as integer codes, which makes groupby/unique/filtering much cheaper.
+CATEGORY_DTYPES = {"category_level_1": "category", "category_level_2": "category"}
+
+def read_cases_csv(file_path):
+    # Arrow's multithreaded reader is much faster on large files; fall back to
+    # the default C engine where pyarrow isn't installed (e.g. in the browser).
+    try:
+        return pd.read_csv(
+            file_path,
+            engine="pyarrow",
+            dtype_backend="pyarrow",
+            dtype=CATEGORY_DTYPES,
+            on_bad_lines='skip',
+        )
+    except (ImportError, TypeError, ValueError):
+        return pd.read_csv(file_path, dtype=CATEGORY_DTYPES, on_bad_lines='skip')
+
 @st.cache_data
 def load_data(file_path, last_updated):
     if not os.path.exists(file_path):
         return None
     try:
-        df = pd.read_csv(file_path, on_bad_lines='skip')
+        df = read_cases_csv(file_path)
     except Exception as e:
         st.warning(f"Error reading CSV (might be writing in progress): {e}")
         return pd.DataFrame()
@@ -58,12 +77,53 @@ def load_data(file_path, last_updated):
             df[col] = "" # Fill missing columns if any
     
     # Fill NAs for visualization
-    df["category_level_1"] = df["category_level_1"].fillna("Unknown")
-    df["category_level_2"] = df["category_level_2"].fillna("Unknown")
+    for col in CATEGORY_DTYPES:
+        values = df[col].astype("category")
+        if "Unknown" not in values.cat.categories:
+            values = values.cat.add_categories("Unknown")
+        df[col] = values.fillna("Unknown")
     df["notes"] = df["notes"].fillna("")
     df["insights"] = df["insights"].fillna("")
     return df
 
+TABLE_COLUMNS = ["case_id", "category_level_1", "category_level_2", "insights", "notes"]
+
+# Derived data is cached separately so widget interactions (which rerun the
+# whole script) don't recompute it; the mtime key invalidates it on rewrite.
+@st.cache_data
+def compute_sunburst(file_path, last_updated):
+    df = load_data(file_path, last_updated)
+    # Only observed pairs, and no sort: plotly orders the slices itself.
+    return (
+        df.groupby(["category_level_1", "category_level_2"], observed=True, sort=False)
+        .size()
+        .reset_index(name="count")
+    )
+
+@st.cache_data
+def get_cat1_options(file_path, last_updated):
+    df = load_data(file_path, last_updated)
+    return ["All"] + sorted(df["category_level_1"].unique().tolist())
+
+@st.cache_data
+def get_cat2_options(file_path, last_updated, cat1):
+    df = load_data(file_path, last_updated)
+    if cat1 != "All":
+        df = df[df["category_level_1"] == cat1]
+    return ["All"] + sorted(df["category_level_2"].unique().tolist())
+
+@st.cache_data
+def filter_cases(file_path, last_updated, cat1, cat2):
+    df = load_data(file_path, last_updated)
+    # Combine the filters into one mask and slice once, rather than copying
+    # the whole frame up front and re-indexing it per filter.
+    mask = np.ones(len(df), dtype=bool)
+    if cat1 != "All":
+        mask &= (df["category_level_1"] == cat1).to_numpy()
+    if cat2 != "All":
+        mask &= (df["category_level_2"] == cat2).to_numpy()
+    return df.loc[mask, TABLE_COLUMNS]
+
 if os.path.exists(DATA_FILE):
     last_updated = os.path.getmtime(DATA_FILE)
 else:
@@ -84,7 +144,7 @@ st.markdown("Click on a **Category Level 1** slice to expand and see **Category
 
 # Prepare data for Sunburst
 # We calculate counts for the chart
-sunburst_data = df.groupby(["category_level_1", "category_level_2"]).size().reset_index(name="count")
+sunburst_data = compute_sunburst(DATA_FILE, last_updated)
 
 fig = px.sunburst(
     sunburst_data,
@@ -104,30 +164,21 @@ st.subheader("Cases")
 col1, col2 = st.columns(2)
 
 with col1:
-    cat1_options = ["All"] + sorted(df["category_level_1"].unique().tolist())
+    cat1_options = get_cat1_options(DATA_FILE, last_updated)
     selected_cat1 = st.selectbox("Filter by Level 1:", cat1_options)
 
 with col2:
-    if selected_cat1 == "All":
-        cat2_options = ["All"] + sorted(df["category_level_2"].unique().tolist())
-    else:
-        filtered_for_cat2 = df[df["category_level_1"] == selected_cat1]
-        cat2_options = ["All"] + sorted(filtered_for_cat2["category_level_2"].unique().tolist())
-    
+    cat2_options = get_cat2_options(DATA_FILE, last_updated, selected_cat1)
     selected_cat2 = st.selectbox("Filter by Level 2:", cat2_options)
 
 # Filter Logic
-filtered_df = df.copy()
-if selected_cat1 != "All":
-    filtered_df = filtered_df[filtered_df["category_level_1"] == selected_cat1]
-if selected_cat2 != "All":
-    filtered_df = filtered_df[filtered_df["category_level_2"] == selected_cat2]
+filtered_df = filter_cases(DATA_FILE, last_updated, selected_cat1, selected_cat2)
 
 st.markdown(f"**Showing {len(filtered_df)} cases**")
 
 # Display as interactive table
 st.dataframe(
-    filtered_df[["case_id", "category_level_1", "category_level_2", "insights", "notes"]],
+    filtered_df,
     use_container_width=True,
     column_config={
         "case_id": "Case ID",
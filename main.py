@@ -2,29 +2,40 @@ import os
 import sys
 import re
 import argparse
+import asyncio
 import random
-import time
 import urllib.parse
-from html.parser import HTMLParser
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
 # Import modules from src
 from src import extract, download, convert, format, classify
 
 ROOT_URL = "https://doha.ogc.osd.mil/Industrial-Security-Program/Industrial-Security-Clearance-Decisions/ISCR-Hearing-Decisions/"
 
+# Link text must contain a standalone year; hrefs may embed it anywhere.
+_YEAR_RE = re.compile(r'\b(20\d{2})\b')
+_HREF_YEAR_RE = re.compile(r'(20\d{2})')
+_API_KEY_RE = re.compile(r'^OPENAI_API_KEY=(.*)$', re.MULTILINE)
+# Matched against the lowercased href
+_SKIP_HREF_PREFIXES = ("#", "javascript:")
+
+# User agents to rotate
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0"
+]
+
 def setup_api_key():
     # Check .env
     env_path = ".env"
     api_key = None
     if os.path.exists(env_path):
         with open(env_path, "r") as f:
-            for line in f:
-                if line.startswith("OPENAI_API_KEY="):
-                    parts = line.strip().split("=", 1)
-                    if len(parts) > 1:
-                        api_key = parts[1]
-                    break
+            match = _API_KEY_RE.search(f.read())
+        if match:
+            api_key = match.group(1).strip()
     
     if not api_key and "OPENAI_API_KEY" in os.environ:
         api_key = os.environ["OPENAI_API_KEY"]
@@ -40,76 +51,67 @@ def setup_api_key():
         else:
             print("No key provided. Classification step might fail.")
 
-def fetch_html(url):
-    print(f"Fetching {url} using Playwright...")
-    # User agents to rotate
-    user_agents = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0"
-    ]
-    
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=random.choice(user_agents))
-        page = context.new_page()
+async def _fetch_html_async(urls):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
         try:
-            page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            time.sleep(2)
-            content = page.content()
-            return content
-        except Exception as e:
-            print(f"Playwright error: {e}")
-            raise
+            context = await browser.new_context(user_agent=random.choice(USER_AGENTS))
+
+            async def fetch(url):
+                page = await context.new_page()
+                try:
+                    await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                    # Give late scripts a chance to render links, but only as
+                    # long as the network is actually busy.
+                    try:
+                        await page.wait_for_load_state("networkidle", timeout=5000)
+                    except PlaywrightTimeoutError:
+                        pass
+                    return await page.content()
+                finally:
+                    await page.close()
+
+            return await asyncio.gather(*(fetch(url) for url in urls))
         finally:
-            browser.close()
-
-class YearParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.years = []
-        self.in_link = False
-        self.current_href = None
-
-    def handle_starttag(self, tag, attrs):
-        if tag == 'a':
-            attrs = dict(attrs)
-            if 'href' in attrs:
-                self.current_href = attrs['href']
-                self.in_link = True
-
-    def handle_endtag(self, tag):
-        if tag == 'a':
-            self.in_link = False
-            self.current_href = None
-
-    def handle_data(self, data):
-        if self.in_link:
-            match = re.search(r'\b(20\d{2})\b', data)
-            if match:
-                self.years.append((match.group(1), self.current_href))
-            elif self.current_href and re.search(r'20\d{2}', self.current_href):
-                 match = re.search(r'(20\d{2})', self.current_href)
-                 if match:
-                     self.years.append((match.group(1), self.current_href))
+            await browser.close()
+
+def fetch_html(urls):
+    """Fetch several pages concurrently with a single browser launch.
+
+    Returns the page contents in the same order as ``urls``.
+    """
+    for url in urls:
+        print(f"Fetching {url} using Playwright...")
+    try:
+        return asyncio.run(_fetch_html_async(urls))
+    except Exception as e:
+        print(f"Playwright error: {e}")
+        raise
+
+def find_year_links(html):
+    search_text = _YEAR_RE.search
+    search_href = _HREF_YEAR_RE.search
+    years = []
+    for text, href in extract.parse_links(html):
+        match = search_text(text) or search_href(href)
+        if match:
+            years.append((match.group(1), href))
+    return years
 
 def select_year():
     try:
-        html = fetch_html(ROOT_URL)
+        [html] = fetch_html([ROOT_URL])
     except Exception as e:
         print(f"Failed to fetch root URL: {e}")
         return None, None
 
-    parser = YearParser()
-    parser.feed(html)
-    
     # Deduplicate with priority for ISCR links
     seen_years = set()
     unique_years = []
     
     # List of (year, link, priority)
     candidates = []
-    for y, link in set(parser.years):
+    for y, link in set(find_year_links(html)):
         priority = 0
         if "ISCR" in link or "iscr" in link.lower():
             priority = 1
@@ -174,7 +176,7 @@ def main():
     source_file = os.path.join(site_source_dir, "index.html")
     if not os.path.exists(source_file):
         try:
-            html_content = fetch_html(year_url)
+            [html_content] = fetch_html([year_url])
             with open(source_file, "w", encoding="utf-8") as f:
                 f.write(html_content)
             print(f"Saved source to {source_file}")
@@ -190,32 +192,31 @@ def main():
     
     raw_links = extract.extract_links(source_file, output_file=None)
     
-    valid_links = []
+    valid_links = set()
     for text, href in raw_links:
         href = href.strip()
-        text = text.strip()
+        href_lower = href.lower()
+        text_lower = text.strip().lower()
         
-        if not href or href.startswith("#") or href.lower().startswith("javascript:"):
+        if not href or href_lower.startswith(_SKIP_HREF_PREFIXES):
             continue
         
         is_pdf = False
-        if href.lower().endswith(".pdf"):
+        if href_lower.endswith(".pdf"):
             is_pdf = True
-        elif text.lower().endswith(".pdf"):
+        elif text_lower.endswith(".pdf"):
             is_pdf = True
-        elif "FileId" in href and ".pdf" in text.lower():
+        elif "FileId" in href and ".pdf" in text_lower:
              is_pdf = True
 
         if is_pdf:
-             full_url = urllib.parse.urljoin(year_url, href)
-             valid_links.append(full_url)
+             valid_links.add(urllib.parse.urljoin(year_url, href))
     
-    valid_links = sorted(list(set(valid_links)))
     print(f"Found {len(valid_links)} PDF links.")
     
     with open(links_file, "w", encoding="utf-8") as f:
-        for link in valid_links:
-            f.write(link + "\n")
+        if valid_links:
+            f.write("\n".join(sorted(valid_links)) + "\n")
 
     # 3. Download PDFs
     print(f"Downloading PDFs to {pdfs_dir}...")
@@ -238,7 +239,8 @@ def main():
     classify_argv = [
         "--input", txt_formatted_dir,
         "--output", output_csv,
-        "--manifest", manifest_path
+        "--manifest", manifest_path,
+        "--cache-db", os.path.join(data_dir, "llm_cache.sqlite"),
     ]
     
     try:
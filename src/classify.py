@@ -1,12 +1,51 @@
 #!/usr/bin/env python3
 import argparse
+import base64
+import contextlib
 import csv
+import hashlib
+import http.client
 import json
 import os
+import re
+import shutil
+import sqlite3
+import subprocess
 import sys
+import threading
 import time
-import urllib.error
+import urllib.parse
 import urllib.request
+from collections import Counter
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Poppler's pdftotext is the fastest extractor when installed.
+PDFTOTEXT = shutil.which("pdftotext")
+PDFTOTEXT_TIMEOUT = 60
+
+
+# One KEY=value assignment per line; optional "export ", optional quotes.
+# [ \t] rather than \s so an empty value never runs onto the next line.
+ENV_LINE_RE = re.compile(
+    rb"^[ \t]*(?:export[ \t]+)?([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*"
+    rb"(?:\"([^\"\n]*)\"|'([^'\n]*)'|(.*?))[ \t\r]*$",
+    re.MULTILINE,
+)
 
 
 def load_dotenv():
@@ -21,31 +60,16 @@ def load_dotenv():
         if not path or not os.path.isfile(path):
             continue
         try:
-            with open(path, "r", encoding="utf-8") as handle:
-                for line in handle:
-                    line = line.strip()
-                    if not line or line.startswith("#"):
-                        continue
-                    if line.startswith("export "):
-                        line = line[len("export ") :].strip()
-                    if "=" not in line:
-                        continue
-                    key, value = line.split("=", 1)
-                    key = key.strip()
-                    value = value.strip()
-                    if not key:
-                        continue
-                    if (
-                        len(value) >= 2
-                        and value[0] == value[-1]
-                        and value[0] in {"'", '"'}
-                    ):
-                        value = value[1:-1]
-                    # Always overwrite with .env values to ensure fresh configuration
-                    os.environ[key] = value
-            return
+            with open(path, "rb") as handle:
+                data = handle.read()
         except OSError:
             continue
+        for match in ENV_LINE_RE.finditer(data):
+            key, double, single, bare = match.groups()
+            value = double if double is not None else single if single is not None else bare
+            # Always overwrite with .env values to ensure fresh configuration
+            os.environ[key.decode("ascii")] = value.decode("utf-8", errors="replace")
+        return
 
 
 load_dotenv()
@@ -131,29 +155,132 @@ DEFAULT_ENDPOINT = os.environ.get(
 )
 DEFAULT_MODEL = os.environ.get("LLM_MODEL", "gpt-4o-mini")
 
+# Transient statuses retried with exponential backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Events read past the end of a streamed JSON reply while looking for
+# [DONE]; a stream that keeps going is abandoned and its connection closed.
+STREAM_DRAIN_FRAMES = 4
+
+FIELDNAMES = [
+    "case_id",
+    "url",
+    "category_level_1",
+    "category_level_2",
+    "insights",
+    "notes",
+    "status",
+]
+OUTPUT_BUFFER_SIZE = 1 << 20
+ROW_FLUSH_EVERY = 32
+
+# Keys of the JSON object the model is asked to return
+LLM_OUTPUT_KEYS = (
+    "category_level_1",
+    "category_level_2",
+    "insights",
+    "notes",
+    "status",
+)
+# Outermost {...} in a reply that wraps the JSON in prose or code fences
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Long cases are split at the last of these separators inside each window
+CHUNK_SEPARATORS = ("\n\n", "\n", ". ")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Files with less extracted text than this are treated as empty (scans)
+MIN_TEXT_CHARS = 50
+
+# Duplicate case ids get "_2", "_3", ... appended to the file's base name
+CASE_SUFFIX_RE = re.compile(r"^(.*)_(\d+)$")
+
+
+# Everything that is the same for every case lives in the system message, so
+# the request prefix is byte-identical across calls and providers' automatic
+# prompt-prefix caching can reuse it; only the case text varies.
+TAXONOMY_JSON_STR = json.dumps(TAXONOMY, indent=2)
+
+# Lookup tables for validate_labels(). If a Level 2 label appeared under
+# several Level 1 keys, the first one wins.
+LEVEL1_SETS = {level1: set(options) for level1, options in TAXONOMY.items()}
+LEVEL2_TO_LEVEL1 = {}
+for _level1, _options in TAXONOMY.items():
+    for _level2 in _options:
+        LEVEL2_TO_LEVEL1.setdefault(_level2, _level1)
+
+PROMPT_RULES = (
+    "- category_level_1 must be one of the Level 1 keys in the taxonomy.\n"
+    "- category_level_2 must be one of the Level 2 values for that Level 1.\n"
+    "- insights must be a one-sentence insight/advice for current applicants based on this decision.\n"
+    "- notes must be a brief ASCII-only summary (<=120 chars) or empty.\n"
+    "- status must be either 'Granted' or 'Denied' based on the decision. Note that this decision is stated in the Conclusion section. \n"
+    "No additional keys. No markdown.\n\n"
+    "Taxonomy (Level 1 -> Level 2):\n"
+    f"{TAXONOMY_JSON_STR}"
+)
+
+SYSTEM_PROMPT = (
+    "You are a classification assistant for security clearance cases.\n"
+    "Return ONLY a JSON object with these keys:\n"
+    "category_level_1, category_level_2, insights, notes, status\n"
+    f"{PROMPT_RULES}"
+)
+
+# --batch-size: several cases per call, answered in one JSON object
+BATCH_SYSTEM_PROMPT = (
+    "You are a classification assistant for security clearance cases.\n"
+    "You will be given a JSON array of cases, each with an id and text.\n"
+    'Return ONLY a JSON object {"results": [...]} with one entry per case, '
+    "in the same order, each an object with these keys:\n"
+    "id, category_level_1, category_level_2, insights, notes, status\n"
+    "- id must be the id of the case, unchanged.\n"
+    f"{PROMPT_RULES}"
+)
+
 
 def build_prompt(case_text):
-    taxonomy_json = json.dumps(TAXONOMY, indent=2)
-    system = (
-        "You are a classification assistant for security clearance cases.\n"
-        "Return ONLY a JSON object with these keys:\n"
-        "category_level_1, category_level_2, insights, notes, status\n"
-        "- category_level_1 must be one of the Level 1 keys in the taxonomy.\n"
-        "- category_level_2 must be one of the Level 2 values for that Level 1.\n"
-        "- insights must be a one-sentence insight/advice for current applicants based on this decision.\n"
-        "- notes must be a brief ASCII-only summary (<=120 chars) or empty.\n"
-        "- status must be either 'Granted' or 'Denied' based on the decision. Note that this decision is stated in the Conclusion section. \n"
-        "No additional keys. No markdown."
-    )
     user = (
-        "Taxonomy (Level 1 -> Level 2):\n"
-        f"{taxonomy_json}\n\n"
         "Case text:\n"
         "<<<\n"
         f"{case_text}\n"
         ">>>"
     )
-    return system, user
+    return SYSTEM_PROMPT, user
+
+
+def chunk_text(text, size=8000, overlap=400):
+    """Split ``text`` into overlapping chunks of at most ``size`` characters.
+
+    Cuts prefer a paragraph break, then a line break, then a sentence end in
+    the second half of the window, and fall back to a hard cut. Text that
+    already fits is returned as a single chunk.
+    """
+    if size < 1:
+        raise ValueError("chunk size must be at least 1")
+    if len(text) <= size:
+        return [text]
+    overlap = max(0, min(overlap, size // 2))
+    chunks = []
+    start = 0
+    while True:
+        end = start + size
+        if end >= len(text):
+            chunks.append(text[start:])
+            return chunks
+        lowest = start + max(overlap + 1, size // 2)
+        for sep in CHUNK_SEPARATORS:
+            cut = text.rfind(sep, lowest, end)
+            if cut != -1:
+                end = cut + len(sep)
+                break
+        chunks.append(text[start:end])
+        start = end - overlap
+
+
+def build_batch_prompt(case_texts):
+    cases = [{"id": str(i), "text": text} for i, text in enumerate(case_texts)]
+    user = "Cases (JSON array):\n" + json.dumps(cases, ensure_ascii=False)
+    return BATCH_SYSTEM_PROMPT, user
 
 
 def is_pdf_file(path):
@@ -165,13 +292,76 @@ def is_pdf_file(path):
         return False
 
 
-def extract_text_from_pdf(path):
+def extractor_chain(extractor):
+    """Extractors to try, in order; "auto" lists every one installed."""
+    if extractor != "auto":
+        return (extractor,)
+    chain = []
+    if PDFTOTEXT:
+        chain.append("pdftotext")
+    if fitz is not None:
+        chain.append("pymupdf")
+    chain.append("pypdf")
+    return tuple(chain)
+
+
+def extract_text_from_pdf(path, extractor="auto"):
+    chain = extractor_chain(extractor)
+    if len(chain) == 1:
+        return PDF_EXTRACTORS[chain[0]](path)
+
+    # auto: a PDF one extractor fails on (or times out on) may still
+    # open in the next
+    errors = []
+    for name in chain:
+        try:
+            return PDF_EXTRACTORS[name](path)
+        except Exception as exc:
+            errors.append(f"{name}: {exc}")
+    raise RuntimeError("; ".join(errors))
+
+
+def extract_text_from_pdf_pymupdf(path):
+    if fitz is None:
+        raise RuntimeError(
+            "Missing dependency: PyMuPDF. Install with: python -m pip install pymupdf"
+        )
+
+    doc = fitz.open(path)
     try:
-        from pypdf import PdfReader
-    except Exception as exc:
+        if doc.needs_pass and not doc.authenticate(""):
+            raise RuntimeError(f"Encrypted PDF: {path}")
+        parts = [page.get_text("text") for page in doc]
+    finally:
+        doc.close()
+    return "\n".join(parts)
+
+
+def extract_text_from_pdf_pdftotext(path):
+    if not PDFTOTEXT:
+        raise RuntimeError(
+            "pdftotext not found. Install poppler-utils or choose another --extractor"
+        )
+    # No -layout: column-preserving padding would spend the --max-chars
+    # budget on whitespace instead of case text.
+    result = subprocess.run(
+        [PDFTOTEXT, "-enc", "UTF-8", path, "-"],
+        capture_output=True,
+        timeout=PDFTOTEXT_TIMEOUT,
+    )
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        message = f"pdftotext failed with exit code {result.returncode}"
+        raise RuntimeError(f"{message}: {stderr}" if stderr else message)
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def extract_text_from_pdf_pypdf(path):
+    if PdfReader is None:
         raise RuntimeError(
-            "Missing dependency: pypdf. Install with: python -m pip install pypdf"
-        ) from exc
+            "Missing dependency: PyMuPDF or pypdf. "
+            "Install with: python -m pip install pymupdf"
+        )
 
     reader = PdfReader(path)
     if reader.is_encrypted:
@@ -188,7 +378,14 @@ def extract_text_from_pdf(path):
     return "\n".join(parts)
 
 
-def load_text(path, allow_non_pdf):
+PDF_EXTRACTORS = {
+    "pdftotext": extract_text_from_pdf_pdftotext,
+    "pymupdf": extract_text_from_pdf_pymupdf,
+    "pypdf": extract_text_from_pdf_pypdf,
+}
+
+
+def load_text(path, allow_non_pdf, extractor="auto"):
     ext = os.path.splitext(path)[1].lower()
     if ext == ".pdf":
         if not is_pdf_file(path):
@@ -196,7 +393,7 @@ def load_text(path, allow_non_pdf):
                 with open(path, "r", encoding="utf-8", errors="replace") as handle:
                     return handle.read(), "not_pdf"
             return "", "not_pdf"
-        return extract_text_from_pdf(path), ""
+        return extract_text_from_pdf(path, extractor), ""
 
     with open(path, "r", encoding="utf-8", errors="replace") as handle:
         return handle.read(), ""
@@ -215,6 +412,279 @@ def iter_case_files(input_path, extensions):
             yield os.path.join(root, name)
 
 
+def file_fingerprint(path):
+    """Identify a file's current contents by path, size and mtime."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.realpath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def skip_key(path, allow_non_pdf, extractor):
+    """Key for remembering that a file had no usable text.
+
+    Besides the file itself this covers every option that decides whether
+    text is found, so changing one re-extracts files skipped before.
+    """
+    fingerprint = file_fingerprint(path)
+    if fingerprint is None:
+        return None
+    return (
+        f"{fingerprint}:{int(bool(allow_non_pdf))}:"
+        f"{'+'.join(extractor_chain(extractor))}:{MIN_TEXT_CHARS}"
+    )
+
+
+class ResponseCache:
+    """Exact-match cache of LLM responses, stored in SQLite.
+
+    Entries are keyed by a hash of the endpoint and the full request payload,
+    so any change to the prompt, model or options is a miss. Files found to
+    have no usable text are remembered in a separate table, keyed by
+    skip_key(), so later runs skip extracting them. Safe to share
+    between worker threads.
+    """
+
+    def __init__(self, path, ttl=0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS skips ("
+                "key TEXT PRIMARY KEY, load_note TEXT NOT NULL, created_at INTEGER NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(endpoint, payload):
+        blob = json.dumps([endpoint, payload], sort_keys=True).encode("utf-8")
+        return hashlib.sha256(blob).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        response, created_at = row
+        if self.ttl and time.time() - created_at > self.ttl:
+            return None
+        return response
+
+    def set(self, key, response):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                (key, response, int(time.time())),
+            )
+            self._conn.commit()
+
+    def get_skip(self, key):
+        """Return the load note stored for an empty file, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT load_note, created_at FROM skips WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        load_note, created_at = row
+        if self.ttl and time.time() - created_at > self.ttl:
+            return None
+        return load_note
+
+    def set_skip(self, key, load_note):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO skips (key, load_note, created_at) VALUES (?, ?, ?)",
+                (key, load_note, int(time.time())),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LLMHTTPError(Exception):
+    def __init__(self, code, body):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.body = body
+
+
+# One keep-alive connection per worker thread and host, so the TCP and TLS
+# handshakes are paid once per thread instead of once per case.
+_thread_local = threading.local()
+
+
+def _proxy_for(scheme, host):
+    """Return ``(proxy_netloc, extra_headers)`` for HTTP(S)_PROXY, or None.
+
+    Reads the same environment (and NO_PROXY) urllib.request.urlopen does.
+    """
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    parts = urllib.parse.urlsplit(proxy if "://" in proxy else "http://" + proxy)
+    headers = {}
+    if parts.username is not None:
+        credentials = ":".join(
+            urllib.parse.unquote(value or "") for value in (parts.username, parts.password)
+        )
+        token = base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+        headers["Proxy-Authorization"] = f"Basic {token}"
+    netloc = parts.hostname or ""
+    if parts.port:
+        netloc = f"{netloc}:{parts.port}"
+    return netloc, headers
+
+
+def _get_connection(scheme, netloc, timeout):
+    """Return ``(conn, proxy_headers)`` for this thread and host.
+
+    ``proxy_headers`` is None unless requests go through a plain HTTP
+    proxy, which needs the absolute URL and these headers on each request;
+    HTTPS goes through a CONNECT tunnel instead.
+    """
+    connections = getattr(_thread_local, "connections", None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    entry = connections.get((scheme, netloc))
+    if entry is None:
+        proxy = _proxy_for(scheme, urllib.parse.urlsplit(f"//{netloc}").hostname or netloc)
+        proxy_headers = None
+        if scheme == "https":
+            if proxy:
+                conn = http.client.HTTPSConnection(proxy[0], timeout=timeout)
+                conn.set_tunnel(netloc, headers=proxy[1])
+            else:
+                conn = http.client.HTTPSConnection(netloc, timeout=timeout)
+        elif proxy:
+            conn = http.client.HTTPConnection(proxy[0], timeout=timeout)
+            proxy_headers = proxy[1]
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=timeout)
+        entry = connections[(scheme, netloc)] = (conn, proxy_headers)
+    return entry
+
+
+def _drop_connection(scheme, netloc):
+    connections = getattr(_thread_local, "connections", {})
+    entry = connections.pop((scheme, netloc), None)
+    if entry is not None:
+        entry[0].close()
+
+
+class JSONObjectTracker:
+    """Follow brace depth across streamed text, ignoring braces in strings."""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text):
+        """Return True once the first top-level object has closed."""
+        for ch in text:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = self.depth > 0
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}" and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    return True
+        return False
+
+
+def read_stream_content(response):
+    """Collect the message content of a streamed (SSE) chat completion.
+
+    Stops collecting once the JSON object in the content has closed, then
+    reads at most STREAM_DRAIN_FRAMES more events looking for ``[DONE]``.
+    Returns ``(content, complete)``; ``complete`` is False when the rest of
+    the body was left unread. Raises if the stream ends before ``[DONE]``
+    while the object is still open, rather than return a fragment.
+    """
+    parts = []
+    tracker = JSONObjectTracker()
+    closed = False
+    extra = 0
+    while True:
+        line = response.readline()
+        if not line:
+            if not closed:
+                raise RuntimeError("stream ended before the response was complete")
+            return "".join(parts), True
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            response.read()
+            return "".join(parts), True
+        if closed:
+            extra += 1
+            if extra > STREAM_DRAIN_FRAMES:
+                return "".join(parts), False
+            continue
+        choices = json.loads(data).get("choices") or []
+        delta = (choices[0].get("delta") or {}).get("content") if choices else None
+        if delta:
+            parts.append(delta)
+            closed = tracker.feed(delta)
+
+
+def post_json(endpoint, data, headers, timeout, stream=False):
+    """POST ``data`` over this thread's pooled connection.
+
+    Returns ``(status, body_bytes)``, or ``(status, content_str)`` for a
+    successful ``stream`` request. A pooled connection the server has
+    already closed is replaced and the request is sent once more.
+    """
+    parts = urllib.parse.urlsplit(endpoint)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    for attempt in range(2):
+        conn, proxy_headers = _get_connection(parts.scheme, parts.netloc, timeout)
+        target, send_headers = path, headers
+        if proxy_headers is not None:
+            target, send_headers = endpoint, {**headers, **proxy_headers}
+        try:
+            conn.request("POST", target, body=data, headers=send_headers)
+            response = conn.getresponse()
+            if stream and 200 <= response.status < 300:
+                content, complete = read_stream_content(response)
+                if not complete:
+                    # Unread body left on the socket; it cannot be reused.
+                    _drop_connection(parts.scheme, parts.netloc)
+                return response.status, content
+            return response.status, response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            _drop_connection(parts.scheme, parts.netloc)
+            if attempt:
+                raise
+        except Exception:
+            _drop_connection(parts.scheme, parts.netloc)
+            raise
+
+
 def call_llm(
     endpoint,
     api_key,
@@ -224,6 +694,9 @@ def call_llm(
     timeout,
     use_response_format,
     max_tokens,
+    cache=None,
+    limiter=None,
+    stream=False,
 ):
     headers = {
         "Content-Type": "application/json",
@@ -241,60 +714,91 @@ def call_llm(
     if use_response_format:
         payload["response_format"] = {"type": "json_object"}
 
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(endpoint, payload)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if limiter is not None:
+        limiter.wait()
+
+    # Added after the cache key: streamed or not, the answer is the same.
+    if stream:
+        payload["stream"] = True
     data = json.dumps(payload).encode("utf-8")
     
     max_retries = 5
     for attempt in range(max_retries + 1):
-        try:
-            request = urllib.request.Request(endpoint, data=data, headers=headers)
-            with urllib.request.urlopen(request, timeout=timeout) as response:
-                raw = response.read().decode("utf-8", errors="replace")
-            decoded = json.loads(raw)
-            content = decoded["choices"][0]["message"]["content"]
+        status, body = post_json(endpoint, data, headers, timeout, stream)
+        if 200 <= status < 300:
+            if stream:
+                content = body
+            else:
+                decoded = json.loads(body.decode("utf-8", errors="replace"))
+                content = decoded["choices"][0]["message"]["content"]
+            if cache is not None and content and is_json_content(content):
+                cache.set(cache_key, content)
             return content
-        except urllib.error.HTTPError as exc:
-            if exc.code == 429:
-                if attempt < max_retries:
-                    # Exponential backoff: 2, 4, 8, 16, 32...
-                    sleep_time = 2 ** (attempt + 1)
-                    print(f"Rate limited (429). Retrying in {sleep_time}s...", file=sys.stderr)
-                    time.sleep(sleep_time)
-                    continue
-            raise 
+        if status in RETRY_STATUSES and attempt < max_retries:
+            # Exponential backoff: 2, 4, 8, 16, 32...
+            sleep_time = 2 ** (attempt + 1)
+            if status == 429:
+                print(f"Rate limited (429). Retrying in {sleep_time}s...", file=sys.stderr)
+            else:
+                print(f"Server error ({status}). Retrying in {sleep_time}s...", file=sys.stderr)
+            time.sleep(sleep_time)
+            continue
+        raise LLMHTTPError(status, body.decode("utf-8", errors="replace"))
 
 
 def extract_json(text):
-    text = text.strip()
-    if text.startswith("{") and text.endswith("}"):
-        return text
-    start = text.find("{")
-    end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        return text[start : end + 1]
-    return text
+    match = JSON_OBJECT_RE.search(text)
+    return (match.group(0) if match else text).strip()
+
+
+def is_json_content(content):
+    # Only replies that parse are cached; a truncated or garbled one would
+    # otherwise be replayed on every later run without a new request.
+    try:
+        json.loads(extract_json(content))
+    except ValueError:
+        return False
+    return True
 
 
 def validate_labels(level1, level2):
-    if level1 in TAXONOMY and level2 in TAXONOMY[level1]:
+    if level2 in LEVEL1_SETS.get(level1, ()):
         return level1, level2, ""
 
-    if level2:
-        for candidate_level1, options in TAXONOMY.items():
-            if level2 in options:
-                return candidate_level1, level2, "level1_corrected"
+    corrected = LEVEL2_TO_LEVEL1.get(level2)
+    if corrected:
+        return corrected, level2, "level1_corrected"
 
     return level1, level2, "invalid_label"
 
 
 def parse_llm_output(content):
     parsed = json.loads(extract_json(content))
-    return {
-        "category_level_1": parsed.get("category_level_1", "").strip(),
-        "category_level_2": parsed.get("category_level_2", "").strip(),
-        "insights": parsed.get("insights", "").strip(),
-        "notes": parsed.get("notes", "").strip(),
-        "status": parsed.get("status", "").strip(),
-    }
+    return {key: (parsed.get(key) or "").strip() for key in LLM_OUTPUT_KEYS}
+
+
+def parse_batch_output(content):
+    """Map each case id in a batched reply to its parsed fields."""
+    text = content.strip()
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        parsed = json.loads(extract_json(text))
+    items = parsed.get("results") if isinstance(parsed, dict) else parsed
+    results = {}
+    for item in items or []:
+        if isinstance(item, dict) and "id" in item:
+            results[str(item["id"])] = {
+                key: (item.get(key) or "").strip() for key in LLM_OUTPUT_KEYS
+            }
+    return results
 
 
 def normalize_confidence(value):
@@ -304,6 +808,246 @@ def normalize_confidence(value):
         return None
 
 
+class RateLimiter:
+    """Space out request starts so at most ``per_minute`` begin each minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute and per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def extract_worker(
+    path, allow_non_pdf, max_chars, extractor="auto", overlap=0, max_chunks=0
+):
+    """Load one case file; runs in a worker process.
+
+    Returns ``(chunks, load_note, load_error)``. The text is split into
+    chunks of at most ``max_chars`` here, keeping only the first
+    ``max_chunks`` when set, and the list is empty when the file has no
+    usable text (fewer than MIN_TEXT_CHARS characters).
+    """
+    try:
+        raw_text, load_note = load_text(path, allow_non_pdf, extractor)
+    except Exception as exc:
+        return [], "", f"load_error: {exc}"
+
+    raw_text = raw_text.replace("\x00", "")
+    if len(raw_text.strip()) < MIN_TEXT_CHARS:
+        return [], load_note, ""
+    chunks = chunk_text(raw_text, max_chars, overlap)
+    if max_chunks:
+        chunks = chunks[:max_chunks]
+    return chunks, load_note, ""
+
+
+def make_row(case_id, url, notes="", level1="", level2="", insights="", status=""):
+    return {
+        "case_id": case_id,
+        "url": url,
+        "category_level_1": level1,
+        "category_level_2": level2,
+        "insights": insights,
+        "notes": notes,
+        "status": status,
+    }
+
+
+def pick_model(args, text):
+    if args.model_short and len(text) < args.short_threshold:
+        return args.model_short
+    return args.model_long or args.model
+
+
+def classify_text(args, limiter, cache, text, model=None):
+    if model is None:
+        model = pick_model(args, text)
+    system_prompt, user_prompt = build_prompt(text)
+    try:
+        content = call_llm(
+            args.endpoint,
+            args.api_key,
+            model,
+            system_prompt,
+            user_prompt,
+            args.timeout,
+            not args.no_response_format,
+            args.max_output_tokens,
+            cache=cache,
+            limiter=limiter,
+            stream=not args.no_stream,
+        )
+        parsed = parse_llm_output(content)
+    finally:
+        if args.sleep:
+            time.sleep(args.sleep)
+
+    level1, level2, label_note = validate_labels(
+        parsed["category_level_1"], parsed["category_level_2"]
+    )
+    long_model = args.model_long or args.model
+    if label_note == "invalid_label" and model != long_model:
+        # The cheaper model missed the taxonomy; ask the larger one once.
+        return classify_text(args, limiter, cache, text, long_model)
+    parsed["category_level_1"] = level1
+    parsed["category_level_2"] = level2
+    parsed["label_note"] = label_note
+    return parsed
+
+
+def merge_chunk_results(results):
+    """Reduce the per-chunk classifications of one case to a single result.
+
+    The (Level 1, Level 2) pair chosen by most chunks wins, ties going to
+    the earlier chunk; chunks with invalid labels only vote if no chunk has
+    a valid one. Insights of the winning chunks are kept, one sentence each.
+    Status comes from the last chunk reporting one, as the decision is in
+    the Conclusion at the end of the case.
+    """
+    voters = [r for r in results if r["label_note"] != "invalid_label"] or results
+    votes = Counter((r["category_level_1"], r["category_level_2"]) for r in voters)
+    (level1, level2), _ = votes.most_common(1)[0]
+    winners = [
+        r
+        for r in voters
+        if r["category_level_1"] == level1 and r["category_level_2"] == level2
+    ]
+
+    insights = []
+    for r in winners:
+        sentence = SENTENCE_END_RE.split(r["insights"], 1)[0]
+        if sentence and sentence not in insights:
+            insights.append(sentence)
+
+    return {
+        "category_level_1": level1,
+        "category_level_2": level2,
+        "insights": " ".join(insights),
+        "notes": next((r["notes"] for r in winners if r["notes"]), ""),
+        "status": next((r["status"] for r in reversed(results) if r["status"]), ""),
+        "label_note": winners[0]["label_note"],
+    }
+
+
+def classify_case(
+    args, limiter, cache, case_id, url, chunks, load_note, load_error, chunk_pool=None
+):
+    if load_error:
+        return make_row(case_id, url, notes=load_error)
+
+    notes = []
+    if load_note:
+        notes.append(load_note)
+    if not chunks:
+        notes.append("empty_text")
+        return make_row(case_id, url, notes="; ".join(notes))
+
+    # Route by case length: every chunk of a split case is "long".
+    if len(chunks) == 1:
+        model = pick_model(args, chunks[0])
+    else:
+        model = args.model_long or args.model
+
+    try:
+        if len(chunks) == 1 or chunk_pool is None:
+            results = [
+                classify_text(args, limiter, cache, chunk, model) for chunk in chunks
+            ]
+        else:
+            # Long case: classify the chunks concurrently, then reduce.
+            results = list(
+                chunk_pool.map(
+                    lambda chunk: classify_text(args, limiter, cache, chunk, model),
+                    chunks,
+                )
+            )
+    except LLMHTTPError as exc:
+        print(f"[ERROR] HTTP {exc.code} for case {case_id}: {exc.body}", file=sys.stderr)
+        return make_row(case_id, url, notes=f"llm_http_error: {exc.code}")
+    except Exception as exc:
+        return make_row(case_id, url, notes=f"llm_error: {exc}")
+
+    parsed = merge_chunk_results(results) if len(results) > 1 else results[0]
+    return case_row(case_id, url, notes, parsed)
+
+
+def case_row(case_id, url, notes, parsed):
+    if parsed["label_note"]:
+        notes.append(parsed["label_note"])
+
+    if parsed["notes"]:
+        notes.insert(0, parsed["notes"])
+
+    return make_row(
+        case_id,
+        url,
+        notes="; ".join(notes),
+        level1=parsed["category_level_1"],
+        level2=parsed["category_level_2"],
+        insights=parsed.get("insights", ""),
+        status=parsed.get("status", ""),
+    )
+
+
+def classify_batch(args, limiter, cache, cases):
+    """Classify several short cases with one LLM call; returns their rows.
+
+    ``cases`` holds ``(case_id, url, text, load_note)`` tuples. Cases the
+    reply leaves out or labels invalidly are classified again on their own.
+    """
+    texts = [text for _, _, text, _ in cases]
+    system_prompt, user_prompt = build_batch_prompt(texts)
+    results = {}
+    try:
+        content = call_llm(
+            args.endpoint,
+            args.api_key,
+            pick_model(args, max(texts, key=len)),
+            system_prompt,
+            user_prompt,
+            args.timeout,
+            not args.no_response_format,
+            args.max_output_tokens * len(cases),
+            cache=cache,
+            limiter=limiter,
+            stream=not args.no_stream,
+        )
+        results = parse_batch_output(content)
+    except LLMHTTPError as exc:
+        print(f"[ERROR] HTTP {exc.code} for batch of {len(cases)}: {exc.body}", file=sys.stderr)
+    except Exception as exc:
+        print(f"[ERROR] Batch of {len(cases)} failed: {exc}", file=sys.stderr)
+    finally:
+        if args.sleep:
+            time.sleep(args.sleep)
+
+    rows = []
+    for i, (case_id, url, text, load_note) in enumerate(cases):
+        parsed = results.get(str(i))
+        if parsed is not None:
+            level1, level2, label_note = validate_labels(
+                parsed["category_level_1"], parsed["category_level_2"]
+            )
+            if label_note != "invalid_label":
+                parsed["category_level_1"] = level1
+                parsed["category_level_2"] = level2
+                parsed["label_note"] = label_note
+                rows.append(case_row(case_id, url, [load_note] if load_note else [], parsed))
+                continue
+        rows.append(classify_case(args, limiter, cache, case_id, url, [text], load_note, ""))
+    return rows
+
+
 def run(argv=None):
     parser = argparse.ArgumentParser(
         description="Classify case texts using an LLM and write results to CSV."
@@ -334,6 +1078,12 @@ def run(argv=None):
         action="store_true",
         help="Allow .pdf files that are not actual PDFs",
     )
+    parser.add_argument(
+        "--extractor",
+        choices=["auto", "pdftotext", "pymupdf", "pypdf"],
+        default="auto",
+        help="PDF text extractor (default: auto, trying pdftotext, then pymupdf, then pypdf)",
+    )
     parser.add_argument(
         "--endpoint",
         default=DEFAULT_ENDPOINT,
@@ -344,6 +1094,37 @@ def run(argv=None):
         default=DEFAULT_MODEL,
         help="LLM model name",
     )
+    parser.add_argument(
+        "--model-short",
+        default=None,
+        help=(
+            "Cheaper model for texts shorter than --short-threshold "
+            "(default: use --model for everything)"
+        ),
+    )
+    parser.add_argument(
+        "--model-long",
+        default=None,
+        help=(
+            "Model for longer texts and for retrying invalid labels "
+            "from --model-short (default: --model)"
+        ),
+    )
+    parser.add_argument(
+        "--short-threshold",
+        type=int,
+        default=2000,
+        help="Texts under this many characters go to --model-short",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help=(
+            "Classify up to this many short cases per LLM call, within the "
+            "--max-chars budget (1 disables batching)"
+        ),
+    )
     parser.add_argument(
         "--api-key",
         default=os.environ.get("LLM_API_KEY") or os.environ.get("OPENAI_API_KEY"),
@@ -359,7 +1140,22 @@ def run(argv=None):
         "--max-chars",
         type=int,
         default=12000,
-        help="Max characters of case text to send to the LLM",
+        help=(
+            "Max characters of case text per LLM call; longer cases are split "
+            "into chunks that are classified separately and merged"
+        ),
+    )
+    parser.add_argument(
+        "--chunk-overlap",
+        type=int,
+        default=400,
+        help="Characters shared by consecutive chunks of a long case",
+    )
+    parser.add_argument(
+        "--max-chunks",
+        type=int,
+        default=0,
+        help="Classify at most this many chunks per case (0 means all; 1 truncates)",
     )
     parser.add_argument(
         "--max-output-tokens",
@@ -378,6 +1174,14 @@ def run(argv=None):
         action="store_true",
         help="Disable JSON response format hint",
     )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help=(
+            "Wait for complete LLM responses instead of streaming them "
+            "and stopping once the JSON object closes"
+        ),
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -387,8 +1191,26 @@ def run(argv=None):
     parser.add_argument(
         "--sleep",
         type=float,
-        default=2.0,
-        help="Seconds to sleep between LLM calls",
+        default=0.0,
+        help="Seconds each worker sleeps after an LLM call",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of cases classified concurrently",
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=0,
+        help="Processes used to extract PDF text (0 means one per CPU)",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=0,
+        help="Max LLM requests started per minute (0 means no limit)",
     )
     parser.add_argument(
         "--dry-run",
@@ -400,12 +1222,27 @@ def run(argv=None):
         action="store_true",
         help="Resume from existing CSV output, skipping already classified cases",
     )
+    parser.add_argument(
+        "--cache-db",
+        default=None,
+        help="SQLite file for caching LLM responses across runs (default: disabled)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=0,
+        help="Seconds before a cached response expires (0 means never)",
+    )
     parser.add_argument(
         "--manifest",
         default="pdfs/manifest.json",
         help="Path to manifest JSON mapping filenames to URLs",
     )
     args = parser.parse_args(argv)
+    if args.max_chars < 1:
+        parser.error("--max-chars must be at least 1")
+    if args.chunk_overlap < 0:
+        parser.error("--chunk-overlap must not be negative")
 
     if not args.input:
         if os.path.isdir("txt_formatted"):
@@ -443,16 +1280,6 @@ def run(argv=None):
         print("Missing API key. Set LLM_API_KEY or OPENAI_API_KEY.", file=sys.stderr)
         return 1
 
-    fieldnames = [
-        "case_id",
-        "url",
-        "category_level_1",
-        "category_level_2",
-        "insights",
-        "notes",
-        "status",
-    ]
-
     # Load manifest if available
     manifest = {}
     if args.manifest and os.path.isfile(args.manifest):
@@ -476,148 +1303,212 @@ def run(argv=None):
         write_header = False
         print(f"Resuming from {args.output}...")
         try:
-            with open(args.output, "r", encoding="utf-8") as handle:
-                reader = csv.DictReader(handle)
-                for row in reader:
-                    if "case_id" in row:
-                        seen_ids.add(row["case_id"])
+            # Only the case_id column is needed; plain csv.reader avoids
+            # building a dict for every row.
+            with open(args.output, "r", newline="", encoding="utf-8") as handle:
+                reader = csv.reader(handle)
+                header = next(reader, [])
+                if "case_id" in header:
+                    col = header.index("case_id")
+                    seen_ids.update(row[col] for row in reader if len(row) > col)
             print(f"Loaded {len(seen_ids)} existing cases.")
         except Exception as exc:
             print(f"Error reading existing CSV: {exc}", file=sys.stderr)
             return 1
 
-    with open(args.output, mode, newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=fieldnames)
+    # Only ids whose base is itself a case id can be generated duplicates;
+    # a real id such as "ISCR_2019" must not push the next "ISCR" to _2020.
+    next_suffix = {}
+    for case_id in seen_ids:
+        match = CASE_SUFFIX_RE.match(case_id)
+        if match and match.group(1) in seen_ids and int(match.group(2)) >= 2:
+            base, suffix = match.group(1), int(match.group(2))
+            next_suffix[base] = max(next_suffix.get(base, 2), suffix + 1)
+
+    jobs = []
+    for path in files:
+        if args.limit and len(jobs) >= args.limit:
+            break
+
+        base_case_id = os.path.splitext(os.path.basename(path))[0]
+        
+        # Resume logic: if strict match found, skip
+        if args.resume and base_case_id in seen_ids:
+            continue
+
+        case_id = base_case_id
+        if case_id in seen_ids:
+            # Start from the last suffix handed out for this base instead of
+            # rescanning from _2; the membership check still guards against
+            # files whose own names end in a suffix.
+            suffix = next_suffix.get(base_case_id, 2)
+            while f"{base_case_id}_{suffix}" in seen_ids:
+                suffix += 1
+            case_id = f"{base_case_id}_{suffix}"
+            next_suffix[base_case_id] = suffix + 1
+        seen_ids.add(case_id)
+        jobs.append((path, case_id, manifest.get(base_case_id, "")))
+
+    limiter = RateLimiter(args.rpm)
+    cache = ResponseCache(args.cache_db, args.cache_ttl) if args.cache_db else None
+
+    with contextlib.ExitStack() as stack:
+        if cache is not None:
+            stack.callback(cache.close)
+        handle = stack.enter_context(
+            open(
+                args.output,
+                mode,
+                newline="",
+                encoding="utf-8",
+                buffering=OUTPUT_BUFFER_SIZE,
+            )
+        )
+        writer = csv.DictWriter(handle, fieldnames=FIELDNAMES)
         if write_header:
             writer.writeheader()
 
-        for path in files:
-            if args.limit and processed >= args.limit:
-                break
+        # Two stages run concurrently: files are loaded (PDF parsing is CPU
+        # bound, so in separate processes) and each loaded case is handed to
+        # the LLM thread pool, which mostly waits on the network. Rows are
+        # written as soon as their case finishes.
+        if any(path.lower().endswith(".pdf") for path, _, _ in jobs):
+            extractor = ProcessPoolExecutor(max_workers=args.extract_workers or None)
+        else:
+            # Plain text needs no parsing; skip process start-up and IPC.
+            extractor = ThreadPoolExecutor(max_workers=1)
+        extractor = stack.enter_context(extractor)
+        # Chunks of long cases get their own pool: a case waiting on its
+        # chunks must not hold the llm_pool threads the chunks would need.
+        chunk_pool = stack.enter_context(
+            ThreadPoolExecutor(max_workers=max(1, args.concurrency))
+        )
+        llm_pool = stack.enter_context(
+            ThreadPoolExecutor(max_workers=max(1, args.concurrency))
+        )
 
-            base_case_id = os.path.splitext(os.path.basename(path))[0]
-            
-            # Resume logic: if strict match found, skip
-            if args.resume and base_case_id in seen_ids:
-                continue
+        # Rows are written in batches; each batch is flushed so an
+        # interrupted run loses at most one batch before --resume.
+        rows = []
+        loading = {}
+        pending = set()
+        # Extraction outruns the rate-limited LLM calls, so files are only
+        # submitted while fewer than this many extractions and LLM tasks
+        # are in flight; otherwise the whole corpus's text would pile up
+        # in memory waiting for the LLM pool.
+        max_in_flight = 2 * max(1, args.concurrency)
+        job_iter = iter(jobs)
+        jobs_left = True
 
-            case_id = base_case_id
-            if case_id in seen_ids:
-                suffix = 2
-                while f"{case_id}_{suffix}" in seen_ids:
-                    suffix += 1
-                case_id = f"{case_id}_{suffix}"
-            seen_ids.add(case_id)
-
-            try:
-                raw_text, load_note = load_text(path, args.allow_non_pdf)
-            except Exception as exc:
-                writer.writerow(
-                    {
-                        "case_id": case_id,
-                        "url": manifest.get(base_case_id, ""),
-                        "category_level_1": "",
-                        "category_level_2": "",
-                        "insights": "",
-                        "notes": f"load_error: {exc}",
-                        "status": "",
-                    }
-                )
-                processed += 1
-                continue
+        def flush_rows():
+            if len(rows) >= ROW_FLUSH_EVERY:
+                writer.writerows(rows)
+                handle.flush()
+                rows.clear()
 
-            raw_text = raw_text.replace("\x00", "")
-            llm_text = raw_text[: args.max_chars]
-            system_prompt, user_prompt = build_prompt(llm_text)
-
-            notes = []
-            if load_note:
-                notes.append(load_note)
-            if not raw_text.strip():
-                notes.append("empty_text")
-                writer.writerow(
-                    {
-                        "url": manifest.get(base_case_id, ""),
-                        "case_id": case_id,
-                        "category_level_1": "",
-                        "category_level_2": "",
-                        "insights": "",
-                        "notes": "; ".join(notes),
-                        "status": "",
-                    }
-                )
-                processed += 1
-                continue
+        # --batch-size: single-chunk cases wait here until a batch is full
+        batch = []
+        batch_chars = 0
 
-            try:
-                content = call_llm(
-                    args.endpoint,
-                    args.api_key,
-                    args.model,
-                    system_prompt,
-                    user_prompt,
-                    args.timeout,
-                    not args.no_response_format,
-                    args.max_output_tokens,
-                )
-                parsed = parse_llm_output(content)
-            except urllib.error.HTTPError as exc:
-                err_msg = exc.read().decode("utf-8", errors="replace")
-                print(f"[ERROR] HTTP {exc.code} for case {case_id}: {err_msg}", file=sys.stderr)
-                writer.writerow(
-                    {
-                        "url": manifest.get(base_case_id, ""),
-                        "category_level_1": "",
-                        "category_level_2": "",
-                        "insights": "",
-                        "notes": f"llm_http_error: {exc.code}",
-                        "status": "",
-                    }
+        def submit_batch(cases):
+            if len(cases) == 1:
+                case_id, url, text, load_note = cases[0]
+                return llm_pool.submit(
+                    classify_case, args, limiter, cache, case_id, url, [text], load_note, ""
                 )
-                processed += 1
-                continue
-            except Exception as exc:
-                writer.writerow(
-                    {
-                        "case_id": case_id,
-                        "url": manifest.get(base_case_id, ""),
-                        "category_level_1": "",
-                        "category_level_2": "",
-                        "insights": "",
-                        "notes": f"llm_error: {exc}",
-                        "status": "",
-                    }
-                )
-                processed += 1
-                continue
+            return llm_pool.submit(classify_batch, args, limiter, cache, cases)
 
-            level1, level2, label_note = validate_labels(
-                parsed["category_level_1"], parsed["category_level_2"]
-            )
-            if label_note:
-                notes.append(label_note)
-
-            insights = parsed.get("insights", "")
-            status = parsed.get("status", "")
-
-            if parsed["notes"]:
-                notes.insert(0, parsed["notes"])
-
-            writer.writerow(
-                {
-                    "case_id": case_id,
-                    "url": manifest.get(base_case_id, ""),
-                    "category_level_1": level1,
-                    "category_level_2": level2,
-                    "insights": insights,
-                    "notes": "; ".join(notes),
-                    "status": status,
-                }
-            )
-            processed += 1
+        try:
+            while True:
+                while jobs_left and len(pending) < max_in_flight:
+                    job = next(job_iter, None)
+                    if job is None:
+                        jobs_left = False
+                        break
+                    path, case_id, url = job
+                    fingerprint = (
+                        skip_key(path, args.allow_non_pdf, args.extractor)
+                        if cache is not None
+                        else None
+                    )
+                    if fingerprint is not None:
+                        load_note = cache.get_skip(fingerprint)
+                        if load_note is not None:
+                            # Known to have no text: emit the empty_text row as-is.
+                            rows.append(
+                                classify_case(
+                                    args, None, None, case_id, url, [], load_note, ""
+                                )
+                            )
+                            processed += 1
+                            continue
+                    future = extractor.submit(
+                        extract_worker,
+                        path,
+                        args.allow_non_pdf,
+                        args.max_chars,
+                        args.extractor,
+                        args.chunk_overlap,
+                        args.max_chunks,
+                    )
+                    loading[future] = (case_id, url, fingerprint)
+                    pending.add(future)
+                flush_rows()
+                if batch and not loading and not jobs_left:
+                    # Nothing left to extract: send the partial batch.
+                    pending.add(submit_batch(batch))
+                    batch, batch_chars = [], 0
+                if not pending:
+                    break
 
-            if args.sleep:
-                time.sleep(args.sleep)
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in loading:
+                        case_id, url, fingerprint = loading.pop(future)
+                        chunks, load_note, load_error = future.result()
+                        if fingerprint is not None and not chunks and not load_error:
+                            cache.set_skip(fingerprint, load_note)
+                        if args.batch_size > 1 and len(chunks) == 1:
+                            text = chunks[0]
+                            if batch and batch_chars + len(text) > args.max_chars:
+                                pending.add(submit_batch(batch))
+                                batch, batch_chars = [], 0
+                            batch.append((case_id, url, text, load_note))
+                            batch_chars += len(text)
+                            if len(batch) >= args.batch_size:
+                                pending.add(submit_batch(batch))
+                                batch, batch_chars = [], 0
+                            continue
+                        pending.add(
+                            llm_pool.submit(
+                                classify_case,
+                                args,
+                                limiter,
+                                cache,
+                                case_id,
+                                url,
+                                chunks,
+                                load_note,
+                                load_error,
+                                chunk_pool,
+                            )
+                        )
+                    else:
+                        result = future.result()
+                        if isinstance(result, list):
+                            rows.extend(result)
+                            processed += len(result)
+                        else:
+                            rows.append(result)
+                            processed += 1
+                        flush_rows()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        finally:
+            writer.writerows(rows)
+            handle.flush()
 
     print(f"Wrote {processed} cases to {args.output}")
     return 0
@@ -1,50 +1,100 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import io
 import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+WRITE_BUFFER_SIZE = 1 << 20
+PREFETCH_DEPTH = 2
 
 
 def is_pdf_file(path):
+    # A raw fd read skips the buffered io layer; we only need five bytes.
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    except OSError:
+        return False
     try:
-        with open(path, "rb") as handle:
-            return handle.read(5) == b"%PDF-"
+        return os.read(fd, 5) == b"%PDF-"
     except OSError:
         return False
+    finally:
+        os.close(fd)
 
 
-def extract_text_from_pdf(path):
+def extract_text_to_file(path, out_handle, data=None):
+    if fitz is None:
+        return extract_text_to_file_pypdf(path, out_handle, data)
+
+    if data is not None:
+        doc = fitz.open(stream=data, filetype="pdf")
+    else:
+        doc = fitz.open(path)
     try:
-        from pypdf import PdfReader
-    except Exception as exc:
+        if doc.needs_pass and not doc.authenticate(""):
+            raise RuntimeError(f"Encrypted PDF: {path}")
+        for index, page in enumerate(doc):
+            if index:
+                out_handle.write(b"\n")
+            out_handle.write(page.get_text("text").encode("utf-8"))
+    finally:
+        doc.close()
+
+
+def extract_text_to_file_pypdf(path, out_handle, data=None):
+    if PdfReader is None:
         raise RuntimeError(
-            "Missing dependency: pypdf. Install with: python -m pip install pypdf"
-        ) from exc
+            "Missing dependency: PyMuPDF or pypdf. "
+            "Install with: python -m pip install pymupdf"
+        )
 
-    reader = PdfReader(path)
+    reader = PdfReader(io.BytesIO(data) if data is not None else path)
     if reader.is_encrypted:
         try:
             reader.decrypt("")
         except Exception as exc:
             raise RuntimeError(f"Encrypted PDF: {path}") from exc
 
-    parts = []
+    first = True
     for page in reader.pages:
         text = page.extract_text() or ""
-        if text:
-            parts.append(text)
-    return "\n".join(parts)
+        if not text:
+            continue
+        if not first:
+            out_handle.write(b"\n")
+        out_handle.write(text.encode("utf-8"))
+        first = False
+
+
+def _iter_pdfs(root):
+    # scandir exposes the entry type from the directory listing itself, so
+    # unlike os.walk this needs no extra stat call per entry.
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_pdfs(entry.path)
+            elif entry.name.lower().endswith(".pdf"):
+                yield entry.path
 
 
 def collect_pdf_files(input_path):
     if os.path.isfile(input_path):
         return [input_path]
 
-    pdf_files = []
-    for root, _, files in os.walk(input_path):
-        for name in files:
-            if name.lower().endswith(".pdf"):
-                pdf_files.append(os.path.join(root, name))
-    return pdf_files
+    return list(_iter_pdfs(input_path))
 
 
 def resolve_output_root(input_path, output_path):
@@ -55,7 +105,76 @@ def resolve_output_root(input_path, output_path):
     return os.path.abspath(output_path)
 
 
-def run(input_path, output_path, overwrite=False, dry_run=False):
+def _read_file(path):
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+def _prefetch(paths, depth=PREFETCH_DEPTH):
+    # Read upcoming files on a background thread so disk I/O for the next
+    # PDF overlaps with parsing the current one.
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        pending = deque()
+        for path in paths:
+            pending.append(reader.submit(_read_file, path))
+            if len(pending) > depth:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+
+def _process_one(path, out_path, dry_run=False, data=None, check_pdf=True):
+    if check_pdf:
+        if data is not None:
+            is_pdf = data[:5] == b"%PDF-"
+        else:
+            is_pdf = is_pdf_file(path)
+        if not is_pdf:
+            return "not_pdf", ""
+
+    if dry_run:
+        return "dry_run", ""
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    # Extract into a temporary file and only then replace the output, so a
+    # failed --overwrite keeps the earlier good .txt.
+    tmp_path = out_path + ".tmp"
+    try:
+        # Binary mode skips the text-layer newline translation; the large
+        # buffer turns many small page writes into a few big ones.
+        with open(tmp_path, "wb", buffering=WRITE_BUFFER_SIZE) as handle:
+            extract_text_to_file(path, handle, data)
+        os.replace(tmp_path, out_path)
+    except Exception as exc:
+        # Don't leave a partial file behind
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return "failed", str(exc)
+    return "written", ""
+
+
+def _process_prefetched(paths, out_paths, check_pdf=True):
+    for path, out_path, future in zip(paths, out_paths, _prefetch(paths)):
+        try:
+            data = future.result()
+        except OSError as exc:
+            # Same outcome as _process_one(): the PDF check treats an
+            # unreadable file as not a PDF, extraction reports it as failed
+            yield ("not_pdf", "") if check_pdf else ("failed", str(exc))
+            continue
+        yield _process_one(path, out_path, data=data, check_pdf=check_pdf)
+
+
+def run(
+    input_path,
+    output_path,
+    overwrite=False,
+    dry_run=False,
+    workers=None,
+    check_pdf=True,
+):
     input_path = os.path.abspath(input_path)
     if not os.path.exists(input_path):
         print(f"Input path not found: {input_path}", file=sys.stderr)
@@ -76,38 +195,62 @@ def run(input_path, output_path, overwrite=False, dry_run=False):
     skipped = 0
     failed = 0
 
+    jobs = []
     for index, path in enumerate(pdf_files, 1):
         rel_path = os.path.relpath(path, input_root)
         rel_no_ext = os.path.splitext(rel_path)[0] + ".txt"
         out_path = os.path.join(output_root, rel_no_ext)
 
-        if not is_pdf_file(path):
-            print(f"[{index}/{total}] Skipping non-PDF: {rel_path}")
-            skipped += 1
-            continue
-
         if os.path.exists(out_path) and not overwrite:
             print(f"[{index}/{total}] Exists, skipping: {rel_no_ext}")
             skipped += 1
             continue
 
-        if dry_run:
-            print(f"[{index}/{total}] Would write: {rel_no_ext}")
-            written += 1
-            continue
+        jobs.append((index, path, rel_path, rel_no_ext, out_path))
 
-        try:
-            text = extract_text_from_pdf(path)
-        except Exception as exc:
-            print(f"[{index}/{total}] Failed: {rel_path} ({exc})", file=sys.stderr)
-            failed += 1
-            continue
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    paths = [job[1] for job in jobs]
+    out_paths = [job[4] for job in jobs]
+    dry_runs = [dry_run] * len(jobs)
+    no_data = [None] * len(jobs)
+    check_pdfs = [check_pdf] * len(jobs)
 
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        with open(out_path, "w", encoding="utf-8", newline="\n") as handle:
-            handle.write(text)
-        print(f"[{index}/{total}] Wrote: {rel_no_ext}")
-        written += 1
+    with contextlib.ExitStack() as stack:
+        if workers > 1 and len(jobs) > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            results = executor.map(
+                _process_one,
+                paths,
+                out_paths,
+                dry_runs,
+                no_data,
+                check_pdfs,
+                chunksize=4,
+            )
+        elif dry_run:
+            results = map(_process_one, paths, out_paths, dry_runs, no_data, check_pdfs)
+        else:
+            results = _process_prefetched(paths, out_paths, check_pdf)
+
+        for (index, _, rel_path, rel_no_ext, _), (status, detail) in zip(
+            jobs, results
+        ):
+            if status == "not_pdf":
+                print(f"[{index}/{total}] Skipping non-PDF: {rel_path}")
+                skipped += 1
+            elif status == "dry_run":
+                print(f"[{index}/{total}] Would write: {rel_no_ext}")
+                written += 1
+            elif status == "failed":
+                print(
+                    f"[{index}/{total}] Failed: {rel_path} ({detail})", file=sys.stderr
+                )
+                failed += 1
+            else:
+                print(f"[{index}/{total}] Wrote: {rel_no_ext}")
+                written += 1
 
     print(
         f"Done. Processed {total} PDFs. Wrote {written}, skipped {skipped}, failed {failed}."
@@ -116,7 +259,7 @@ def run(input_path, output_path, overwrite=False, dry_run=False):
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Convert PDF files to text files using pypdf."
+        description="Convert PDF files to text files using PyMuPDF (or pypdf)."
     )
     parser.add_argument(
         "--input",
@@ -138,9 +281,27 @@ def main():
         action="store_true",
         help="Show what would be converted without writing files",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--skip-pdf-check",
+        action="store_true",
+        help="Trust the .pdf extension and skip the %%PDF- header check",
+    )
     args = parser.parse_args()
 
-    return run(args.input, args.output, args.overwrite, args.dry_run)
+    return run(
+        args.input,
+        args.output,
+        args.overwrite,
+        args.dry_run,
+        args.workers,
+        not args.skip_pdf_check,
+    )
 
 
 if __name__ == "__main__":
@@ -1,13 +1,23 @@
 import os
 import sys
-import time
 import random
 import json
-from playwright.sync_api import sync_playwright
+import re
+import asyncio
+import urllib.parse
+from playwright.async_api import async_playwright
 
 LINKS_FILE = 'extracted_links.txt'
 OUTPUT_DIR = 'pdfs'
 MANIFEST_FILE = 'manifest.json'
+# Rewrite the manifest after this many new entries (and always at the end)
+MANIFEST_FLUSH_EVERY = 25
+# Browser contexts downloading in parallel
+DOWNLOAD_WORKERS = 4
+# Pause after each download, per worker, to avoid rate limiting
+REQUEST_DELAY = 1
+
+CONTENT_DISPOSITION_RE = re.compile(r"""filename\*?=(?:UTF-8'')?["']?([^"';]+)""", re.IGNORECASE)
 
 # User agents from download_pdfs.py to avoid 403s
 USER_AGENTS = [
@@ -17,7 +27,192 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/121.0",
 ]
 
-def download_pdfs(links_file=LINKS_FILE, output_dir=OUTPUT_DIR):
+def filename_from_response(headers, url):
+    disposition = headers.get("content-disposition", "")
+    match = CONTENT_DISPOSITION_RE.search(disposition)
+    if match:
+        name = urllib.parse.unquote(match.group(1).strip())
+    else:
+        name = urllib.parse.unquote(os.path.basename(urllib.parse.urlparse(url).path))
+    # Never let a server-supplied name escape output_dir
+    name = os.path.basename(name.replace("\\", "/"))
+    # Only called for PDF responses; later steps pick files by extension
+    if name and not name.lower().endswith(".pdf"):
+        name += ".pdf"
+    return name
+
+def save_manifest(manifest_path, manifest):
+    with open(manifest_path, 'w') as mf:
+        json.dump(manifest, mf, indent=2)
+
+async def _download_all(urls, output_dir, manifest, manifest_path, workers):
+    # Reverse index so the "already downloaded?" check is a dict lookup
+    url_to_fname = {furl: fname for fname, furl in manifest.items()}
+    unsaved = 0
+    contexts = []
+
+    queue = asyncio.Queue()
+    for item in enumerate(urls, 1):
+        queue.put_nowait(item)
+
+    def record(filename, url):
+        nonlocal unsaved
+        # Update manifest; written out in batches, see below.
+        # All workers share one event loop, so no lock is needed.
+        manifest[filename] = url
+        url_to_fname[url] = filename
+        unsaved += 1
+        if unsaved >= MANIFEST_FLUSH_EVERY:
+            save_manifest(manifest_path, manifest)
+            unsaved = 0
+
+    # Output names written (or being written) this run. Claimed with no
+    # await between the check and the claim, so two workers whose URLs
+    # resolve to the same name can't both write it.
+    claimed = set()
+
+    async def fetch_direct(api, i, url):
+        # Plain HTTP for URLs that serve the PDF directly; returns False if
+        # the page needs a real browser.
+        try:
+            head = await api.head(url, timeout=30000)
+            if not head.ok or "pdf" not in head.headers.get("content-type", "").lower():
+                return False
+
+            filename = filename_from_response(head.headers, head.url) or f"doc_{i}.pdf"
+            filepath = os.path.join(output_dir, filename)
+            if filename in claimed:
+                print(f"   Skipping (duplicate name): {filename}")
+                return True
+            if os.path.exists(filepath):
+                print(f"   Skipping (exists): {filename}")
+                record(filename, url)
+                return True
+
+            claimed.add(filename)
+            saved = False
+            try:
+                response = await api.get(url, timeout=60000)
+                if not response.ok:
+                    return False
+                # The request API only hands out whole bodies, so the PDF
+                # is buffered; a temporary name keeps a failed write from
+                # leaving a truncated file that later counts as "exists".
+                body = await response.body()
+                tmp_path = filepath + ".part"
+                try:
+                    with open(tmp_path, 'wb') as out:
+                        out.write(body)
+                    os.replace(tmp_path, filepath)
+                except OSError:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                    raise
+                saved = True
+            finally:
+                if not saved:
+                    claimed.discard(filename)
+            print(f"   Downloaded: {filename}")
+            record(filename, url)
+            return True
+        except Exception:
+            return False
+
+    async def worker(p, context, user_agent):
+        page = await context.new_page()
+        # Shares the worker's user agent; HTTP keep-alive, no page
+        api = await p.request.new_context(user_agent=user_agent)
+        try:
+            while True:
+                try:
+                    i, url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                try:
+                    print(f"[{i}/{len(urls)}] Visiting: {url}")
+                    
+                    # Check if URL is already in manifest (and file exists)
+                    existing_filename = url_to_fname.get(url)
+                    if existing_filename and os.path.exists(os.path.join(output_dir, existing_filename)):
+                         print(f"   Skipping (already downloaded): {existing_filename}")
+                         continue
+
+                    if await fetch_direct(api, i, url):
+                        await asyncio.sleep(REQUEST_DELAY)
+                        continue
+
+                    # Not a direct PDF link: let the browser handle it.
+                    # Expect a download event
+                    try:
+                        async with page.expect_download(timeout=30000) as download_info:
+                            # Navigate to URL. 
+                            # We use a try-except here because if the server responds with a 
+                            # file download immediately, navigate might raise an error or stay in 'loading' 
+                            # but the download event will still fire.
+                            try:
+                                await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                            except Exception:
+                                # Verify if it was just a navigation abort due to download
+                                pass 
+
+                        download = await download_info.value
+                        filename = download.suggested_filename
+                        
+                        # Sanitize output filename
+                        if not filename:
+                            filename = f"doc_{i}.pdf"
+                        
+                        filepath = os.path.join(output_dir, filename)
+
+                        # Check for duplicates or existing files
+                        if filename in claimed:
+                            print(f"   Skipping (duplicate name): {filename}")
+                        elif os.path.exists(filepath):
+                            print(f"   Skipping (exists): {filename}")
+                            record(filename, url)
+                        else:
+                            claimed.add(filename)
+                            try:
+                                await download.save_as(filepath)
+                            except Exception:
+                                claimed.discard(filename)
+                                raise
+                            print(f"   Downloaded: {filename}")
+                            record(filename, url)
+
+                    except Exception as dl_error:
+                        print(f"   Download failed: {dl_error}")
+
+                    # Sleep briefly to avoid rate limiting
+                    await asyncio.sleep(REQUEST_DELAY)
+
+                except Exception as e:
+                    print(f"   Error processing {url}: {e}")
+        finally:
+            await api.dispose()
+
+    async with async_playwright() as p:
+        # Launch browser
+        print("Launching browser...")
+        browser = await p.chromium.launch(headless=True)
+        
+        try:
+            # One context per worker, each with a real user agent
+            for _ in range(max(1, workers)):
+                user_agent = random.choice(USER_AGENTS)
+                context = await browser.new_context(accept_downloads=True, user_agent=user_agent)
+                contexts.append((context, user_agent))
+            await asyncio.gather(*(worker(p, context, user_agent) for context, user_agent in contexts))
+        finally:
+            # Always persist what was downloaded, even on Ctrl-C
+            if unsaved:
+                save_manifest(manifest_path, manifest)
+            await browser.close()
+
+def download_pdfs(links_file=LINKS_FILE, output_dir=OUTPUT_DIR, workers=DOWNLOAD_WORKERS):
     if not os.path.exists(links_file):
         print(f"Error: {links_file} not found.")
         return
@@ -40,76 +235,8 @@ def download_pdfs(links_file=LINKS_FILE, output_dir=OUTPUT_DIR):
         except:
             pass
 
-    with sync_playwright() as p:
-        # Launch browser
-        print("Launching browser...")
-        browser = p.chromium.launch(headless=True)
-        
-        # Create context with a real user agent
-        user_agent = random.choice(USER_AGENTS)
-        context = browser.new_context(accept_downloads=True, user_agent=user_agent)
-        page = context.new_page()
-
-        for i, url in enumerate(urls, 1):
-            try:
-                print(f"[{i}/{len(urls)}] Visiting: {url}")
-                
-                # Check if URL is already in manifest (and file exists)
-                existing_filename = None
-                for fname, furl in manifest.items():
-                    if furl == url:
-                        existing_filename = fname
-                        break
-                
-                if existing_filename and os.path.exists(os.path.join(output_dir, existing_filename)):
-                     print(f"   Skipping (already downloaded): {existing_filename}")
-                     continue
-
-                # Expect a download event
-                try:
-                    with page.expect_download(timeout=30000) as download_info:
-                        # Navigate to URL. 
-                        # We use a try-except here because if the server responds with a 
-                        # file download immediately, navigate might raise an error or stay in 'loading' 
-                        # but the download event will still fire.
-                        try:
-                            response = page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                        except Exception as nav_e:
-                            # Verify if it was just a navigation abort due to download
-                            pass 
-
-                    download = download_info.value
-                    filename = download.suggested_filename
-                    
-                    # Sanitize output filename
-                    if not filename:
-                        filename = f"doc_{i}.pdf"
-                    
-                    filepath = os.path.join(output_dir, filename)
-
-                    # Check for duplicates or existing files
-                    if os.path.exists(filepath):
-                        print(f"   Skipping (exists): {filename}")
-                    else:
-                        download.save_as(filepath)
-                        print(f"   Downloaded: {filename}")
-                    
-                    # Update manifest
-                    manifest[filename] = url
-                    with open(manifest_path, 'w') as mf:
-                        json.dump(manifest, mf, indent=2)
-
-                except Exception as dl_error:
-                    print(f"   Download failed: {dl_error}")
-
-                # Sleep briefly to avoid rate limiting
-                time.sleep(1)
-
-            except Exception as e:
-                print(f"   Error processing {url}: {e}")
-
-        browser.close()
-        print("Done.")
+    asyncio.run(_download_all(urls, output_dir, manifest, manifest_path, workers))
+    print("Done.")
 
 if __name__ == "__main__":
     download_pdfs()
@@ -2,10 +2,17 @@ import re
 import sys
 from html.parser import HTMLParser
 
+try:
+    from selectolax.parser import HTMLParser as FastHTML
+except ImportError:
+    FastHTML = None
+
 class HrefParser(HTMLParser):
-    def __init__(self):
+    def __init__(self, on_link=None):
         super().__init__()
-        self.links = [] # List of (text, href)
+        self.links = [] # List of (text, href), unless on_link is given
+        self.count = 0
+        self._on_link = on_link
         self._current_href = None
         self._current_text = []
         self._in_anchor = False
@@ -22,12 +29,48 @@ class HrefParser(HTMLParser):
             self._in_anchor = False
             if self._current_href:
                 text = " ".join(self._current_text).strip()
-                self.links.append((text, self._current_href))
+                if self._on_link:
+                    self._on_link(text, self._current_href)
+                else:
+                    self.links.append((text, self._current_href))
+                self.count += 1
             self._current_href = None
 
     def handle_data(self, data):
         if self._in_anchor:
-            self._current_text.append(data.strip())
+            # Skip whitespace-only chunks so the joined text matches
+            # selectolax's text(separator=" ", strip=True).
+            data = data.strip()
+            if data:
+                self._current_text.append(data)
+
+def parse_links(content, on_link=None):
+    """Return (text, href) for every anchor with a non-empty href.
+
+    If ``on_link`` is given, each pair is passed to it as soon as it is found
+    instead of being collected, and the number of links is returned.
+    """
+    if FastHTML is None:
+        parser = HrefParser(on_link)
+        try:
+            parser.feed(content)
+        except Exception as e:
+            print(f"Warning: HTML parsing error: {e}")
+        return parser.count if on_link else parser.links
+
+    links = []
+    count = 0
+    for node in FastHTML(content).css("a[href]"):
+        href = (node.attributes.get("href") or "").strip()
+        if not href:
+            continue
+        text = node.text(separator=" ", strip=True)
+        if on_link:
+            on_link(text, href)
+        else:
+            links.append((text, href))
+        count += 1
+    return count if on_link else links
 
 def extract_links(html_file, output_file=None):
     try:
@@ -37,26 +80,25 @@ def extract_links(html_file, output_file=None):
         print(f"Error: {html_file} not found.")
         sys.exit(1)
 
-    parser = HrefParser()
+    if not output_file:
+        # Return list of (text, url)
+        return parse_links(content)
+
+    # Write links as they are parsed rather than collecting them first;
+    # returns the number of links written.
+    count = 0
     try:
-        parser.feed(content)
-    except Exception as e:
-        print(f"Warning: HTML parsing error: {e}")
+        with open(output_file, 'w', encoding='utf-8') as f:
+            def write_link(text, link):
+                # simplistic representation for text file
+                f.write(f"{link}\t{text}\n")
 
-    # Return list of (text, url)
-    links = parser.links
-    
-    if output_file:
-        try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                for text, link in links:
-                    # simplistic representation for text file
-                    f.write(f"{link}\t{text}\n")
-            print(f"Successfully extracted {len(links)} links to {output_file}")
-        except Exception as e:
-            print(f"Error writing to {output_file}: {e}")
+            count = parse_links(content, write_link)
+        print(f"Successfully extracted {count} links to {output_file}")
+    except Exception as e:
+        print(f"Error writing to {output_file}: {e}")
     
-    return links
+    return count
 
 if __name__ == "__main__":
     # Input file is links.txt (containing HTML), output is extracted_links.txt
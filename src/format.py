@@ -1,25 +1,65 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import functools
 import os
 import re
 import sys
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+# In-process runs read upcoming files and write finished ones on threads
+IO_THREADS = 4
+PIPELINE_DEPTH = 2 * (os.cpu_count() or 1)
+# Bigger files are streamed rather than read into memory ahead of time
+PIPELINE_MAX_BYTES = 64 << 20
+# Chunk size when comparing new output against an existing file
+COMPARE_CHUNK_SIZE = 64 << 10
+# Buffer size for the streaming path; the 8 KiB default means 16x the syscalls
+STREAM_BUFFER_SIZE = 128 << 10
+
+# Drop control characters, turn lone CR into LF and NBSP/tab into spaces.
+# CRLF is replaced before either of these is applied.
+NORMALIZE_TABLE = str.maketrans(
+    {
+        **{code: None for code in [*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20)]},
+        0x0D: "\n",
+        0x09: " ",
+        0xA0: " ",
+    }
+)
+CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
 
 
-CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
-MULTISPACE_RE = re.compile(r"[ \t]+")
-PAGE_NUMBER_RE = re.compile(r"^\d{1,4}$")
+def _iter_txt_files(root):
+    # scandir exposes the entry type from the directory listing itself, so
+    # unlike os.walk this needs no extra stat call per entry. An explicit
+    # stack avoids recursion limits on deep trees.
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            # os.walk silently skipped unreadable directories too
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    name = entry.name
+                    # Exact match first; lower() only for odd casings
+                    if name.endswith(".txt") or name.lower().endswith(".txt"):
+                        yield entry.path
 
 
 def collect_txt_files(input_path):
     if os.path.isfile(input_path):
         return [input_path]
 
-    txt_files = []
-    for root, _, files in os.walk(input_path):
-        for name in files:
-            if name.lower().endswith(".txt"):
-                txt_files.append(os.path.join(root, name))
-    return txt_files
+    return list(_iter_txt_files(input_path))
 
 
 def resolve_output_root(input_path, output_path, in_place):
@@ -34,76 +74,93 @@ def resolve_output_root(input_path, output_path, in_place):
     return os.path.abspath(output_path)
 
 
-def normalize_lines(text, collapse_spaces, strip_page_numbers):
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = text.replace("\u00a0", " ")
-    text = text.replace("\t", " ")
-    text = CONTROL_CHARS_RE.sub("", text)
-    lines = text.split("\n")
-
-    normalized = []
-    for line in lines:
-        if collapse_spaces:
-            line = MULTISPACE_RE.sub(" ", line)
-        line = line.strip()
-        if strip_page_numbers and PAGE_NUMBER_RE.fullmatch(line or ""):
-            continue
-        normalized.append(line)
-    return normalized
+def normalize_chars(text):
+    # translate() has a fast path for ASCII strings only; on anything else
+    # it does a dict lookup per character and is ~10x slower than three
+    # C-level replace() passes plus one regex. A single regex with a
+    # replacement callback is slower than either.
+    if text.isascii():
+        return text.translate(NORMALIZE_TABLE)
+    text = text.replace("\r", "\n").replace("\u00a0", " ").replace("\t", " ")
+    return CONTROL_CHARS_RE.sub("", text)
 
 
-def collapse_blank_lines(lines, max_blank_lines):
-    collapsed = []
-    blank_count = 0
+def join_paragraph_lines(lines):
+    # Pieces are joined once at the end; growing one string line by line
+    # copies the whole paragraph on every append.
+    parts = []
     for line in lines:
-        if line == "":
-            blank_count += 1
-            if blank_count <= max_blank_lines:
-                collapsed.append("")
+        if parts and parts[-1].endswith("-") and line and line[0].islower():
+            # Word hyphenated across the line break
+            parts[-1] = parts[-1][:-1] + line
         else:
-            blank_count = 0
-            collapsed.append(line)
-    return trim_blank_edges(collapsed)
-
-
-def trim_blank_edges(lines):
-    start = 0
-    end = len(lines)
-    while start < end and lines[start] == "":
-        start += 1
-    while end > start and lines[end - 1] == "":
-        end -= 1
-    return lines[start:end]
-
-
-def join_paragraph_lines(lines):
-    if not lines:
-        return ""
-    combined = lines[0]
-    for next_line in lines[1:]:
-        if combined.endswith("-") and next_line and next_line[0].islower():
-            combined = combined[:-1] + next_line
+            parts.append(line)
+    return " ".join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def make_formatter(max_blank_lines=1, collapse_spaces=True, unwrap=False, strip_page_numbers=False):
+    """Return a ``text -> formatted text`` function for one set of options.
+
+    The options are fixed for a whole run, so they are resolved once here
+    instead of being re-checked for every line; cached, so each worker
+    process builds each variant once. The result leaves off the final
+    newline: writers append it rather than copying the whole text to add
+    one character.
+    """
+    # Without unwrapping, blank runs are capped by a regex over the joined
+    # text: max_blank_lines + 2 or more newlines become max_blank_lines + 1.
+    # Spelled out as literal newlines plus "\n+", not "\n{n,}", so re can
+    # use its fast literal-prefix search (about 12x faster here).
+    blank_run = "\n" * (max_blank_lines + 1)
+    blank_run_re = re.compile(blank_run + "\n+")
+
+    def formatter(text):
+        lines = normalize_chars(text.replace("\r\n", "\n")).split("\n")
+        if collapse_spaces:
+            # Collapses inner whitespace runs and strips the ends in one go
+            lines = [" ".join(line.split()) for line in lines]
         else:
-            if combined:
-                combined += " "
-            combined += next_line
-    return combined
+            lines = [line.strip() for line in lines]
+        if strip_page_numbers:
+            # Page numbers: 1-4 digits. isdecimal() accepts what \d does,
+            # unlike isdigit(), which also takes superscripts. Dropped
+            # lines don't end a run of blank lines.
+            lines = [line for line in lines if not (len(line) <= 4 and line.isdecimal())]
+
+        if not unwrap:
+            return blank_run_re.sub(blank_run, "\n".join(lines).strip("\n"))
+
+        # Collapsing blank runs and joining paragraph lines in one pass
+        out = []
+        append = out.append
+        paragraph = []
+        add_line = paragraph.append
+        blank_count = 0
+        for line in lines:
+            if not line:
+                blank_count += 1
+                if blank_count <= max_blank_lines:
+                    if paragraph:
+                        append(join_paragraph_lines(paragraph))
+                        paragraph.clear()
+                    # Leading blank lines are dropped
+                    if out:
+                        append("")
+                continue
+            blank_count = 0
+            add_line(line)
 
+        if paragraph:
+            append(join_paragraph_lines(paragraph))
+        end = len(out)
+        while end and out[end - 1] == "":
+            end -= 1
+        if end < len(out):
+            del out[end:]
+        return "\n".join(out)
 
-def unwrap_paragraphs(lines):
-    unwrapped = []
-    current = []
-    for line in lines:
-        if line == "":
-            if current:
-                unwrapped.append(join_paragraph_lines(current))
-                current = []
-            unwrapped.append("")
-        else:
-            current.append(line)
-    if current:
-        unwrapped.append(join_paragraph_lines(current))
-    return trim_blank_edges(unwrapped)
+    return formatter
 
 
 def format_text(
@@ -113,20 +170,274 @@ def format_text(
     unwrap=False,
     strip_page_numbers=False,
 ):
-    lines = normalize_lines(text, collapse_spaces, strip_page_numbers)
-    lines = collapse_blank_lines(lines, max_blank_lines)
-    if unwrap:
-        lines = unwrap_paragraphs(lines)
-    return "\n".join(lines) + "\n"
+    return make_formatter(max_blank_lines, collapse_spaces, unwrap, strip_page_numbers)(text) + "\n"
 
 
-def write_text(path, text):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8", newline="\n") as handle:
-        handle.write(text)
+def format_stream(in_handle, out_handle, max_blank_lines=1, collapse_spaces=True, strip_page_numbers=False):
+    """Format line by line, holding only the current line in memory.
 
+    Gives the same output as format_text() without unwrap. ``in_handle``
+    must be a text file opened with universal newlines (the default), so
+    CRLF and lone CR already arrive as line ends.
+    """
+    write = out_handle.write
+    blank_count = 0
+    # Blank lines are only written once more text follows them, which
+    # drops leading and trailing blanks without lookahead.
+    pending_blanks = 0
+    started = False
+    for line in in_handle:
+        line = normalize_chars(line)
+        if collapse_spaces:
+            line = " ".join(line.split())
+        else:
+            line = line.strip()
 
-def run(input_path, output_path, in_place=False, overwrite=False, dry_run=False, max_blank_lines=1, keep_spaces=False, unwrap=False, strip_page_numbers=False):
+        if not line:
+            blank_count += 1
+            if started and blank_count <= max_blank_lines:
+                pending_blanks += 1
+            continue
+
+        if strip_page_numbers and len(line) <= 4 and line.isdecimal():
+            continue
+
+        blank_count = 0
+        if pending_blanks:
+            write("\n" * pending_blanks)
+            pending_blanks = 0
+        write(line)
+        write("\n")
+        started = True
+
+    if not started:
+        write("\n")
+
+
+def _same_contents(path, data, tail):
+    try:
+        if os.path.getsize(path) != len(data) + len(tail):
+            return False
+        with open(path, "rb") as handle:
+            view = memoryview(data)
+            for start in range(0, len(data), COMPARE_CHUNK_SIZE):
+                piece = view[start : start + COMPARE_CHUNK_SIZE]
+                if handle.read(len(piece)) != piece:
+                    return False
+            return handle.read() == tail
+    except OSError:
+        return False
+
+
+def _same_file_contents(path, other):
+    try:
+        if os.path.getsize(path) != os.path.getsize(other):
+            return False
+        with open(path, "rb") as handle, open(other, "rb") as other_handle:
+            while True:
+                chunk = handle.read(COMPARE_CHUNK_SIZE)
+                if chunk != other_handle.read(COMPARE_CHUNK_SIZE):
+                    return False
+                if not chunk:
+                    return True
+    except OSError:
+        return False
+
+
+def write_text(path, text, end="\n"):
+    """Write ``text`` and then ``end`` to ``path``.
+
+    Returns False, without writing, if the file already holds exactly
+    that: leaving it alone keeps its mtime, so re-runs (especially
+    --in-place) don't churn unchanged files.
+    """
+    # The output directory is created by run() before any file is written
+    data = text.encode("utf-8")
+    tail = end.encode("utf-8")
+    if _same_contents(path, data, tail):
+        return False
+    with open(path, "wb") as handle:
+        handle.write(data)
+        handle.write(tail)
+    return True
+
+
+# Per-thread read buffer, reused for every file formatted in memory so a
+# run of large files doesn't map and fault in a fresh buffer per file.
+# Kept only up to PIPELINE_MAX_BYTES; a bigger file's buffer is released.
+_local = threading.local()
+
+
+def _read_text(path, max_bytes=None):
+    """Read and decode a whole file, or return None if it is over max_bytes."""
+    scratch = getattr(_local, "scratch", None)
+    if scratch is None:
+        scratch = _local.scratch = bytearray()
+    n = 0
+    # One fstat and normally a single read() for the whole file, without
+    # the buffered reader's extra read to find EOF
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if max_bytes is not None and size > max_bytes:
+            return None
+        if len(scratch) <= size:
+            # One spare byte, so a full buffer means the file grew
+            scratch.extend(bytes(size + 1 - len(scratch)))
+        with os.fdopen(fd, "rb", buffering=0, closefd=False) as handle:
+            while True:
+                with memoryview(scratch)[n:] as free:
+                    got = handle.readinto(free)
+                if not got:
+                    break
+                n += got
+                if n == size:
+                    # The spare byte stayed empty: at EOF
+                    break
+                if n == len(scratch):
+                    scratch.extend(bytes(len(scratch)))
+        # Decode straight from the buffer instead of copying it into bytes first
+        with memoryview(scratch)[:n] as data:
+            return str(data, "utf-8", "replace")
+    finally:
+        os.close(fd)
+        if len(scratch) > PIPELINE_MAX_BYTES + 1:
+            _local.scratch = None
+
+
+def _process_one(path, out_path, options):
+    """Format one file; runs in a worker process when --workers > 1.
+
+    Returns ``(status, detail)`` with status ``failed``, ``write_failed``,
+    ``unchanged`` or ``written``.
+    """
+    if not options["unwrap"]:
+        return _stream_one(path, out_path, options)
+
+    try:
+        formatted = make_formatter(**options)(_read_text(path))
+    except Exception as exc:
+        return "failed", str(exc)
+
+    try:
+        changed = write_text(out_path, formatted)
+    except Exception as exc:
+        return "write_failed", str(exc)
+    return ("written" if changed else "unchanged"), ""
+
+
+def _stream_one(path, out_path, options):
+    # Streams into a temporary file that replaces the output only once the
+    # whole input has been read: a failure mid-way keeps the previous
+    # output, and an output that is the input under another name (symlinked
+    # output directory, --in-place) is never truncated while being read.
+    tmp_path = out_path + ".tmp"
+    try:
+        src = open(
+            path, "r", encoding="utf-8", errors="replace", buffering=STREAM_BUFFER_SIZE
+        )
+    except OSError as exc:
+        return "failed", str(exc)
+
+    with src:
+        try:
+            dst = open(
+                tmp_path,
+                "w",
+                encoding="utf-8",
+                newline="\n",
+                buffering=STREAM_BUFFER_SIZE,
+            )
+        except OSError as exc:
+            return "write_failed", str(exc)
+
+        try:
+            with dst:
+                format_stream(
+                    src,
+                    dst,
+                    options["max_blank_lines"],
+                    options["collapse_spaces"],
+                    options["strip_page_numbers"],
+                )
+        except Exception as exc:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            return "failed", str(exc)
+
+    # Same rule as write_text(): an output that would not change is left
+    # alone, whichever path formatted it
+    if _same_file_contents(tmp_path, out_path):
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        return "unchanged", ""
+    try:
+        os.replace(tmp_path, out_path)
+    except OSError as exc:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        return "write_failed", str(exc)
+    return "written", ""
+
+
+def _prefetch(paths, depth=PIPELINE_DEPTH):
+    # Read upcoming files on background threads so disk I/O for the next
+    # files overlaps with formatting the current one.
+    with ThreadPoolExecutor(max_workers=IO_THREADS) as reader:
+        pending = deque()
+        for path in paths:
+            pending.append(reader.submit(_read_text, path, PIPELINE_MAX_BYTES))
+            if len(pending) > depth:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+
+def _write_one(out_path, formatted):
+    try:
+        changed = write_text(out_path, formatted)
+    except Exception as exc:
+        return "write_failed", str(exc)
+    return ("written" if changed else "unchanged"), ""
+
+
+def _process_pipelined(paths, out_paths, options):
+    # Formatting stays on this thread; reads and writes happen around it.
+    # Results are yielded in input order, each either ready or a pending
+    # write, and at most PIPELINE_DEPTH writes are held back.
+    formatter = make_formatter(**options)
+    with ThreadPoolExecutor(max_workers=IO_THREADS) as writer:
+        results = deque()
+        for path, out_path, future in zip(paths, out_paths, _prefetch(paths)):
+            try:
+                text = future.result()
+            except OSError as exc:
+                results.append(("failed", str(exc)))
+            else:
+                if text is None:
+                    results.append(_process_one(path, out_path, options))
+                else:
+                    try:
+                        formatted = formatter(text)
+                    except Exception as exc:
+                        results.append(("failed", str(exc)))
+                    else:
+                        results.append(writer.submit(_write_one, out_path, formatted))
+
+            while results and (
+                len(results) > PIPELINE_DEPTH
+                or not isinstance(results[0], Future)
+                or results[0].done()
+            ):
+                result = results.popleft()
+                yield result.result() if isinstance(result, Future) else result
+
+        while results:
+            result = results.popleft()
+            yield result.result() if isinstance(result, Future) else result
+
+
+def run(input_path, output_path, in_place=False, overwrite=False, dry_run=False, max_blank_lines=1, keep_spaces=False, unwrap=False, strip_page_numbers=False, workers=None):
     input_path = os.path.abspath(input_path)
     if not os.path.exists(input_path):
         print(f"Input path not found: {input_path}", file=sys.stderr)
@@ -147,11 +458,17 @@ def run(input_path, output_path, in_place=False, overwrite=False, dry_run=False,
     skipped = 0
     failed = 0
 
+    # input_path and output_root are absolute and normalized, and every
+    # collected path starts with input_root, so relative and output paths
+    # come from plain string operations (relpath/abspath call getcwd()).
+    input_prefix = os.path.join(input_root, "")
+
+    jobs = []
     for index, path in enumerate(txt_files, 1):
-        rel_path = os.path.relpath(path, input_root)
+        rel_path = path[len(input_prefix):]
         out_path = os.path.join(output_root, rel_path)
 
-        if not in_place and os.path.abspath(out_path) == os.path.abspath(path):
+        if not in_place and out_path == path:
             if not overwrite:
                 print(
                     f"[{index}/{total}] Output equals input, skipping: {rel_path}"
@@ -169,33 +486,57 @@ def run(input_path, output_path, in_place=False, overwrite=False, dry_run=False,
             written += 1
             continue
 
-        try:
-            with open(path, "r", encoding="utf-8", errors="replace") as handle:
-                raw_text = handle.read()
-            formatted = format_text(
-                raw_text,
-                max_blank_lines=max(0, max_blank_lines),
-                collapse_spaces=not keep_spaces,
-                unwrap=unwrap,
-                strip_page_numbers=strip_page_numbers,
-            )
-        except Exception as exc:
-            print(f"[{index}/{total}] Failed: {rel_path} ({exc})", file=sys.stderr)
-            failed += 1
-            continue
-
-        try:
-            write_text(out_path, formatted)
-        except Exception as exc:
-            print(
-                f"[{index}/{total}] Failed to write: {rel_path} ({exc})",
-                file=sys.stderr,
-            )
-            failed += 1
-            continue
+        jobs.append((index, path, rel_path, out_path))
+
+    # Each output directory is created once here rather than once per file
+    # (and once per worker process).
+    made_dirs = set()
+    for _, _, _, out_path in jobs:
+        out_dir = os.path.dirname(out_path)
+        if out_dir not in made_dirs:
+            made_dirs.add(out_dir)
+            try:
+                os.makedirs(out_dir, exist_ok=True)
+            except OSError:
+                # Reported per file when the write fails
+                pass
+
+    options = {
+        "max_blank_lines": max(0, max_blank_lines),
+        "collapse_spaces": not keep_spaces,
+        "unwrap": unwrap,
+        "strip_page_numbers": strip_page_numbers,
+    }
+    process = functools.partial(_process_one, options=options)
+    paths = [job[1] for job in jobs]
+    out_paths = [job[3] for job in jobs]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with contextlib.ExitStack() as stack:
+        if workers > 1 and len(jobs) > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            results = executor.map(process, paths, out_paths, chunksize=8)
+        else:
+            results = _process_pipelined(paths, out_paths, options)
 
-        print(f"[{index}/{total}] Wrote: {rel_path}")
-        written += 1
+        for (index, _, rel_path, _), (status, detail) in zip(jobs, results):
+            if status == "failed":
+                print(f"[{index}/{total}] Failed: {rel_path} ({detail})", file=sys.stderr)
+                failed += 1
+            elif status == "write_failed":
+                print(
+                    f"[{index}/{total}] Failed to write: {rel_path} ({detail})",
+                    file=sys.stderr,
+                )
+                failed += 1
+            elif status == "unchanged":
+                print(f"[{index}/{total}] Unchanged: {rel_path}")
+                skipped += 1
+            else:
+                print(f"[{index}/{total}] Wrote: {rel_path}")
+                written += 1
 
     print(
         f"Done. Processed {total} files. Wrote {written}, skipped {skipped}, failed {failed}."
@@ -252,9 +593,15 @@ def main():
         action="store_true",
         help="Remove lines that contain only page numbers",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: CPU count)",
+    )
     args = parser.parse_args()
 
-    return run(args.input, args.output, args.in_place, args.overwrite, args.dry_run, args.max_blank_lines, args.keep_spaces, args.unwrap, args.strip_page_numbers)
+    return run(args.input, args.output, args.in_place, args.overwrite, args.dry_run, args.max_blank_lines, args.keep_spaces, args.unwrap, args.strip_page_numbers, args.workers)
 
 
 if __name__ == "__main__":
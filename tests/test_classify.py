@@ -0,0 +1,245 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import classify
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "cache.db")
+
+    def open_cache(self, ttl=0):
+        cache = classify.ResponseCache(self.path, ttl)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_key_covers_endpoint_and_payload(self):
+        key = classify.ResponseCache.make_key("http://a", {"model": "m", "x": 1})
+        self.assertEqual(key, classify.ResponseCache.make_key("http://a", {"x": 1, "model": "m"}))
+        self.assertNotEqual(key, classify.ResponseCache.make_key("http://b", {"model": "m", "x": 1}))
+        self.assertNotEqual(key, classify.ResponseCache.make_key("http://a", {"model": "m", "x": 2}))
+
+    def test_round_trip_persists(self):
+        self.open_cache().set("k", '{"status": "granted"}')
+        cache = self.open_cache()
+        self.assertEqual(cache.get("k"), '{"status": "granted"}')
+        self.assertIsNone(cache.get("missing"))
+
+    def test_ttl_expires_responses(self):
+        cache = self.open_cache(ttl=60)
+        cache.set("k", "{}")
+        now = classify.time.time()
+        with mock.patch.object(classify.time, "time", return_value=now + 30):
+            self.assertEqual(cache.get("k"), "{}")
+        with mock.patch.object(classify.time, "time", return_value=now + 120):
+            self.assertIsNone(cache.get("k"))
+
+    def test_skips_round_trip_and_expire(self):
+        cache = self.open_cache(ttl=60)
+        self.assertIsNone(cache.get_skip("file"))
+        cache.set_skip("file", "not_pdf")
+        now = classify.time.time()
+        with mock.patch.object(classify.time, "time", return_value=now + 30):
+            self.assertEqual(cache.get_skip("file"), "not_pdf")
+        with mock.patch.object(classify.time, "time", return_value=now + 120):
+            self.assertIsNone(cache.get_skip("file"))
+
+    def test_skip_key_covers_extraction_options(self):
+        path = os.path.join(os.path.dirname(self.path), "case.pdf")
+        with open(path, "w") as handle:
+            handle.write("not really a pdf")
+        key = classify.skip_key(path, False, "pypdf")
+        self.assertEqual(key, classify.skip_key(path, False, "pypdf"))
+        self.assertNotEqual(key, classify.skip_key(path, True, "pypdf"))
+        self.assertNotEqual(key, classify.skip_key(path, False, "pdftotext"))
+        with open(path, "a") as handle:
+            handle.write(" any more")
+        self.assertNotEqual(key, classify.skip_key(path, False, "pypdf"))
+        self.assertIsNone(classify.skip_key(path + ".missing", False, "pypdf"))
+
+
+def chunk_result(level1, level2, insights="", notes="", status="", label_note=""):
+    return {
+        "category_level_1": level1,
+        "category_level_2": level2,
+        "insights": insights,
+        "notes": notes,
+        "status": status,
+        "label_note": label_note,
+    }
+
+
+class ChunkTextTests(unittest.TestCase):
+    def reassemble(self, chunks, overlap):
+        text = chunks[0]
+        for prev, chunk in zip(chunks, chunks[1:]):
+            self.assertTrue(chunk.startswith(prev[len(prev) - overlap:]))
+            text += chunk[overlap:]
+        return text
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(classify.chunk_text("abc", 3, 1), ["abc"])
+        self.assertEqual(classify.chunk_text("", 10, 2), [""])
+
+    def test_chunks_fit_overlap_and_cover_text(self):
+        text = "".join(f"Sentence {i} of the case. " for i in range(400))
+        text += "\n\n".join("Paragraph %d." % i for i in range(50))
+        for size, overlap in [(100, 20), (257, 0), (1000, 400), (64, 500)]:
+            chunks = classify.chunk_text(text, size, overlap)
+            self.assertGreater(len(chunks), 1)
+            self.assertTrue(all(len(chunk) <= size for chunk in chunks))
+            # Overlap is capped at half a chunk
+            self.assertEqual(self.reassemble(chunks, min(overlap, size // 2)), text)
+
+    def test_hard_cut_without_separators(self):
+        chunks = classify.chunk_text("x" * 100, 30, 5)
+        self.assertTrue(all(len(chunk) <= 30 for chunk in chunks))
+        self.assertEqual(self.reassemble(chunks, 5), "x" * 100)
+
+    def test_prefers_paragraph_break(self):
+        text = "a" * 60 + "\n\n" + "b. " * 10 + "c" * 60
+        first = classify.chunk_text(text, 80, 0)[0]
+        self.assertEqual(first, "a" * 60 + "\n\n")
+
+    def test_size_below_one_is_rejected(self):
+        with self.assertRaises(ValueError):
+            classify.chunk_text("x" * 100, 0, 400)
+
+
+class MergeChunkResultsTests(unittest.TestCase):
+    def test_majority_label_wins(self):
+        merged = classify.merge_chunk_results(
+            [
+                chunk_result("A", "a1", "First point. More."),
+                chunk_result("B", "b1", "Other."),
+                chunk_result("A", "a1", "Second point."),
+            ]
+        )
+        self.assertEqual((merged["category_level_1"], merged["category_level_2"]), ("A", "a1"))
+        self.assertEqual(merged["insights"], "First point. Second point.")
+
+    def test_tie_goes_to_earlier_chunk(self):
+        merged = classify.merge_chunk_results(
+            [chunk_result("B", "b1"), chunk_result("A", "a1")]
+        )
+        self.assertEqual(merged["category_level_1"], "B")
+
+    def test_invalid_labels_vote_only_without_valid_ones(self):
+        merged = classify.merge_chunk_results(
+            [
+                chunk_result("X", "x1", label_note="invalid_label"),
+                chunk_result("X", "x1", label_note="invalid_label"),
+                chunk_result("A", "a1"),
+            ]
+        )
+        self.assertEqual(merged["category_level_1"], "A")
+        self.assertEqual(merged["label_note"], "")
+
+        merged = classify.merge_chunk_results(
+            [chunk_result("X", "x1", label_note="invalid_label")]
+        )
+        self.assertEqual(merged["label_note"], "invalid_label")
+
+    def test_status_from_last_chunk_reporting_one(self):
+        merged = classify.merge_chunk_results(
+            [
+                chunk_result("A", "a1", status="denied"),
+                chunk_result("A", "a1", status="granted"),
+                chunk_result("B", "b1"),
+            ]
+        )
+        self.assertEqual(merged["status"], "granted")
+
+
+def sse(*deltas, done=True, extra=()):
+    lines = [b": keep-alive\n\n"]
+    for delta in (*deltas, *extra):
+        event = {"choices": [{"delta": {"content": delta}}]}
+        lines.append(b"data: " + json.dumps(event).encode() + b"\n\n")
+    if done:
+        lines.append(b"data: [DONE]\n\n")
+    return io.BytesIO(b"".join(lines))
+
+
+class JSONObjectTrackerTests(unittest.TestCase):
+    def feed_all(self, *pieces):
+        tracker = classify.JSONObjectTracker()
+        return [tracker.feed(piece) for piece in pieces]
+
+    def test_closes_on_outermost_brace(self):
+        self.assertEqual(self.feed_all('{"a": {"b": 1}', "}"), [False, True])
+
+    def test_braces_and_escaped_quotes_in_strings(self):
+        self.assertEqual(
+            self.feed_all('{"a": "}{ \\"', '}"', ', "b": "x\\\\"', "}"),
+            [False, False, False, True],
+        )
+
+    def test_text_before_object_is_ignored(self):
+        self.assertEqual(self.feed_all('Sure: "quote" {', '"a": 1}'), [False, True])
+
+
+class ReadStreamContentTests(unittest.TestCase):
+    def test_collects_deltas_until_done(self):
+        response = sse('{"status": ', '"granted"}')
+        self.assertEqual(
+            classify.read_stream_content(response), ('{"status": "granted"}', True)
+        )
+        self.assertEqual(response.read(), b"")
+
+    def test_stops_after_object_closes(self):
+        trailing = ["x"] * (classify.STREAM_DRAIN_FRAMES + 5)
+        response = sse('{"a": 1}', extra=trailing)
+        content, complete = classify.read_stream_content(response)
+        self.assertEqual(content, '{"a": 1}')
+        self.assertFalse(complete)
+
+    def test_eof_after_object_closes_is_complete(self):
+        response = sse('{"a": 1}', done=False)
+        self.assertEqual(classify.read_stream_content(response), ('{"a": 1}', True))
+
+    def test_eof_inside_object_raises(self):
+        with self.assertRaises(RuntimeError):
+            classify.read_stream_content(sse('{"category_level_1": ', done=False))
+
+
+class ParseBatchOutputTests(unittest.TestCase):
+    def test_results_by_id(self):
+        content = json.dumps(
+            {
+                "results": [
+                    {"id": 0, "category_level_1": " A ", "status": "granted"},
+                    {"id": "1", "category_level_1": "B", "insights": None},
+                ]
+            }
+        )
+        results = classify.parse_batch_output(content)
+        self.assertEqual(set(results), {"0", "1"})
+        self.assertEqual(results["0"]["category_level_1"], "A")
+        self.assertEqual(results["0"]["status"], "granted")
+        self.assertEqual(results["1"]["insights"], "")
+        self.assertEqual(set(results["1"]), set(classify.LLM_OUTPUT_KEYS))
+
+    def test_bare_list_and_wrapped_reply(self):
+        items = [{"id": "0", "status": "denied"}]
+        self.assertEqual(classify.parse_batch_output(json.dumps(items))["0"]["status"], "denied")
+        wrapped = "```json\n" + json.dumps({"results": items}) + "\n```"
+        self.assertEqual(classify.parse_batch_output(wrapped)["0"]["status"], "denied")
+
+    def test_entries_without_id_are_dropped(self):
+        content = json.dumps({"results": [{"status": "granted"}, "junk", {"id": 2}]})
+        self.assertEqual(set(classify.parse_batch_output(content)), {"2"})
+
+    def test_invalid_json_raises(self):
+        with self.assertRaises(ValueError):
+            classify.parse_batch_output('{"results": [')
+
+
+if __name__ == "__main__":
+    unittest.main()
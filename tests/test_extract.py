@@ -0,0 +1,52 @@
+import unittest
+from unittest import mock
+
+from src import extract
+
+PAGE = """
+<ul>
+  <li><a href=" /decisions/2019/19-001.pdf ">ISCR Case No. 19-001</a></li>
+  <li><a href="/decisions/2020/20-002.pdf">ISCR <b>Case</b>
+      No. 20-002</a></li>
+  <li><a href="">empty href</a></li>
+  <li><a name="anchor">no href</a></li>
+</ul>
+"""
+
+EXPECTED = [
+    ("ISCR Case No. 19-001", "/decisions/2019/19-001.pdf"),
+    ("ISCR Case No. 20-002", "/decisions/2020/20-002.pdf"),
+]
+
+
+def normalize(links):
+    # The two parsers join text across inline tags slightly differently
+    return [(" ".join(text.split()), href) for text, href in links]
+
+
+class ParseLinksTests(unittest.TestCase):
+    def test_fallback_parser(self):
+        with mock.patch.object(extract, "FastHTML", None):
+            self.assertEqual(normalize(extract.parse_links(PAGE)), EXPECTED)
+
+    def test_fallback_parser_callback(self):
+        seen = []
+        with mock.patch.object(extract, "FastHTML", None):
+            count = extract.parse_links(PAGE, lambda text, href: seen.append((text, href)))
+        self.assertEqual(count, 2)
+        self.assertEqual(normalize(seen), EXPECTED)
+
+    @unittest.skipIf(extract.FastHTML is None, "selectolax not installed")
+    def test_selectolax_parser(self):
+        self.assertEqual(normalize(extract.parse_links(PAGE)), EXPECTED)
+
+    @unittest.skipIf(extract.FastHTML is None, "selectolax not installed")
+    def test_selectolax_parser_callback(self):
+        seen = []
+        count = extract.parse_links(PAGE, lambda text, href: seen.append((text, href)))
+        self.assertEqual(count, 2)
+        self.assertEqual(normalize(seen), EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()
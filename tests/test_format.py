@@ -0,0 +1,139 @@
+import contextlib
+import io
+import itertools
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from src import format as fmt
+
+# Pieces the random inputs are built from: CR/LF variants, control and
+# non-ASCII characters, page-number-like digit runs and hyphenated words
+PIECES = [
+    "a", "Word", "end-", "next", " ", "  ", "\t", "\xa0", "\n", "\n\n", "\r\n",
+    "\r", "\x00", "\x0b", "\x0c", "\x1f", "1", "12", "12345", "٣", "\xe9",
+    "\xb2", " ", "\x85",
+]
+
+
+def stream(text, *options):
+    src = io.TextIOWrapper(io.BytesIO(text.encode("utf-8")), encoding="utf-8")
+    out = io.StringIO()
+    fmt.format_stream(src, out, *options)
+    return out.getvalue()
+
+
+def quiet_run(*args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fmt.run(*args, **kwargs)
+
+
+class FormatStreamTests(unittest.TestCase):
+    def test_matches_format_text(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 60)))
+            for options in itertools.product([0, 1, 2], [True, False], [True, False]):
+                max_blank_lines, collapse_spaces, strip_page_numbers = options
+                expected = fmt.format_text(
+                    text,
+                    max_blank_lines,
+                    collapse_spaces,
+                    unwrap=False,
+                    strip_page_numbers=strip_page_numbers,
+                )
+                self.assertEqual(stream(text, *options), expected, (text, options))
+
+    def test_examples(self):
+        text = "\r\n\n  Title\t here \r\n\r\n\r\n\r\n12\n\nBody\x00 text\n\n\n"
+        self.assertEqual(stream(text, 1, True, True), "Title here\n\nBody text\n")
+        self.assertEqual(stream(text, 0, False, False), "Title  here\n12\nBody text\n")
+        self.assertEqual(stream("", 1, True, False), "\n")
+
+
+class StreamOutputTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.input_dir = os.path.join(self.root, "txt")
+        os.mkdir(self.input_dir)
+        self.write(os.path.join(self.input_dir, "a.txt"), "one   two\n\n\n\nthree\n")
+        self.write(os.path.join(self.input_dir, "b.txt"), "b  b\n")
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as handle:
+            return handle.read()
+
+    def test_output_aliasing_input_is_not_truncated(self):
+        alias = os.path.join(self.root, "alias")
+        try:
+            os.symlink(self.input_dir, alias)
+        except (OSError, NotImplementedError):
+            self.skipTest("symlinks not available")
+        quiet_run(self.input_dir, alias, overwrite=True, workers=2)
+        self.assertEqual(self.read(os.path.join(self.input_dir, "a.txt")), "one two\n\nthree\n")
+        self.assertEqual(self.read(os.path.join(self.input_dir, "b.txt")), "b b\n")
+        self.assertEqual(sorted(os.listdir(self.input_dir)), ["a.txt", "b.txt"])
+
+    def test_failure_keeps_previous_output(self):
+        out_path = os.path.join(self.root, "out.txt")
+        self.write(out_path, "previous\n")
+        options = {
+            "max_blank_lines": 1,
+            "collapse_spaces": True,
+            "unwrap": False,
+            "strip_page_numbers": False,
+        }
+        in_path = os.path.join(self.input_dir, "a.txt")
+        with mock.patch.object(fmt, "format_stream", side_effect=MemoryError("line")):
+            self.assertEqual(fmt._process_one(in_path, out_path, options)[0], "failed")
+        self.assertEqual(self.read(out_path), "previous\n")
+        self.assertEqual(os.listdir(self.root).count("out.txt.tmp"), 0)
+
+
+class UnchangedOutputTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def test_write_text_skips_identical_contents(self):
+        path = os.path.join(self.root, "out.txt")
+        text = "x" * (fmt.COMPARE_CHUNK_SIZE + 10)
+        self.assertTrue(fmt.write_text(path, text))
+        self.assertFalse(fmt.write_text(path, text))
+        # Same length, different last byte; and a missing final newline
+        self.assertTrue(fmt.write_text(path, text[:-1] + "y"))
+        self.assertTrue(fmt.write_text(path, text[:-1] + "y", end=""))
+        with open(path, encoding="utf-8") as handle:
+            self.assertEqual(handle.read(), text[:-1] + "y")
+
+    def test_rerun_reports_unchanged_for_any_worker_count(self):
+        input_dir = os.path.join(self.root, "txt")
+        os.mkdir(input_dir)
+        for name in ("a.txt", "b.txt", "c.txt"):
+            with open(os.path.join(input_dir, name), "w", encoding="utf-8") as handle:
+                handle.write(f"{name}   text\n\n\n\nmore\n")
+        for unwrap in (False, True):
+            output_dir = os.path.join(self.root, f"out_{unwrap}")
+            quiet_run(input_dir, output_dir, overwrite=True, unwrap=unwrap, workers=1)
+            out_path = os.path.join(output_dir, "a.txt")
+            os.utime(out_path, ns=(0, 0))
+            for workers in (1, 2):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    fmt.run(input_dir, output_dir, overwrite=True, unwrap=unwrap, workers=workers)
+                self.assertIn("Wrote 0, skipped 3", output.getvalue())
+                self.assertEqual(os.stat(out_path).st_mtime_ns, 0)
+            self.assertEqual(sorted(os.listdir(output_dir)), ["a.txt", "b.txt", "c.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()